@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Generator syntetycznych projektów LookML oraz zestaw benchmarków dla lookml_comparison.
+Generuje parę folderów old/new o zadanej skali, mierzy osobno czas i szczytowe zużycie pamięci
+kolejnych etapów (parsowanie, porównanie, lista zmian, raporty, łączenie) i zapisuje wyniki do JSON,
+aby regresje można było porównywać między wersjami.
+
+Przykład:
+    python lookml_benchmark.py --views 500 --fields 40 --change-rate 0.02 --output bench.json
+    python lookml_benchmark.py --views 500 --fields 40 --baseline bench.json
+"""
+
+import os
+import io
+import json
+import time
+import random
+import shutil
+import argparse
+import platform
+import tempfile
+import tracemalloc
+from pathlib import Path
+from contextlib import redirect_stdout
+
+import lookml_comparison as lc
+
+CHANGE_KINDS = ('label', 'sql', 'attribute_added', 'attribute_removed', 'element_added', 'element_removed', 'type_changed')
+
+# --- Generator syntetycznego projektu ---
+
+def _field_block(kind, name, view_name, rng):
+    lines = [f"  {kind}: {name} {{"]
+    if kind == 'dimension_group':
+        lines.append("    type: time")
+        lines.append("    timeframes: [raw, date, week, month, quarter, year]")
+    elif kind == 'measure':
+        lines.append(f"    type: {rng.choice(['sum', 'count_distinct', 'average', 'max'])}")
+    else:
+        lines.append(f"    type: {rng.choice(['string', 'number', 'yesno'])}")
+    lines.append(f"    sql: ${{TABLE}}.{name} ;;")
+    lines.append(f'    label: "{name.replace("_", " ").title()}"')
+    lines.append(f'    description: "Pole {name} widoku {view_name}"')
+    if kind == 'measure':
+        lines.append(f"    drill_fields: [{view_name}_f0, {view_name}_f1]")
+    lines.append("    link: {")
+    lines.append(f'      label: "Szczegóły {name}"')
+    lines.append(f'      url: "/dashboards/1?{name}={{{{ value }}}}"')
+    lines.append("    }")
+    lines.append("  }")
+    return "\n".join(lines)
+
+def _render_view(view_name, fields):
+    body = "\n\n".join(block for _, block in fields)
+    return f"view: {view_name} {{\n  sql_table_name: analytics.{view_name} ;;\n\n{body}\n}}\n"
+
+def generate_project_pair(target_dir, views=100, fields_per_view=20, nesting_depth=2, change_rate=0.01,
+                          change_kinds=CHANGE_KINDS, seed=42):
+    """
+    Tworzy w `target_dir` foldery `old` i `new` z syntetycznym projektem LookML.
+    Widoki rozkładane są w podkatalogach o głębokości `nesting_depth`; w folderze `new`
+    około `change_rate` wszystkich pól zmienia się w sposób losowo wybrany z `change_kinds`.
+    Zwraca słownik z parametrami i liczbą wprowadzonych zmian.
+    """
+    rng = random.Random(seed)
+    target_dir = Path(target_dir)
+    old_root, new_root = target_dir / "old", target_dir / "new"
+    for root in (old_root, new_root):
+        if root.exists():
+            shutil.rmtree(root)
+        root.mkdir(parents=True)
+
+    changes_made = {kind: 0 for kind in change_kinds}
+    kinds = ['dimension'] * 6 + ['measure'] * 3 + ['dimension_group']
+    for view_index in range(views):
+        view_name = f"view_{view_index}"
+        subdir = Path(*[f"area_{(view_index // (4 ** level)) % 4}" for level in range(nesting_depth)]) if nesting_depth else Path()
+        old_fields, new_fields = [], []
+        for field_index in range(fields_per_view):
+            kind = kinds[field_index % len(kinds)]
+            name = f"{view_name}_f{field_index}"
+            block = _field_block(kind, name, view_name, rng)
+            old_fields.append((name, block))
+            if not change_kinds or rng.random() >= change_rate:
+                new_fields.append((name, block))
+                continue
+            change_kind = rng.choice(change_kinds)
+            changes_made[change_kind] += 1
+            if change_kind == 'label':
+                new_fields.append((name, block.replace('    label: "', '    label: "Nowa ', 1)))
+            elif change_kind == 'sql':
+                new_fields.append((name, block.replace(" ;;", " * 100 ;;", 1)))
+            elif change_kind == 'attribute_added':
+                new_fields.append((name, block.replace("    sql:", "    hidden: yes\n    sql:", 1)))
+            elif change_kind == 'attribute_removed':
+                # Usuwamy tylko linię description - pozostałe atrybuty (także losowy type) zostają bez zmian
+                new_fields.append((name, "\n".join(line for line in block.split("\n") if not line.startswith("    description:"))))
+            elif change_kind == 'element_added':
+                new_fields.append((name, block))
+                new_fields.append((f"{name}_new", _field_block(kind, f"{name}_new", view_name, rng)))
+            elif change_kind == 'element_removed':
+                pass
+            elif change_kind == 'type_changed':
+                new_kind = 'measure' if kind != 'measure' else 'dimension'
+                new_fields.append((name, block.replace(f"  {kind}: {name} {{", f"  {new_kind}: {name} {{", 1)))
+        for root, fields in ((old_root, old_fields), (new_root, new_fields)):
+            view_dir = root / subdir
+            view_dir.mkdir(parents=True, exist_ok=True)
+            (view_dir / f"{view_name}.view.lkml").write_text(_render_view(view_name, fields), encoding='utf-8')
+
+    return {
+        'views': views,
+        'fields_per_view': fields_per_view,
+        'nesting_depth': nesting_depth,
+        'change_rate': change_rate,
+        'change_kinds': list(change_kinds),
+        'seed': seed,
+        'changes_made': changes_made
+    }
+
+# --- Pomiary ---
+
+def _measure(function, repeat=1, setup=None):
+    """
+    Zwraca (wynik, najlepszy czas w sekundach, szczytowa pamięć w bajtach) dla `function`.
+    Czas mierzony jest bez tracemalloc (który wielokrotnie spowalnia alokacje), pamięć w osobnym przebiegu.
+    Opcjonalne `setup` wywoływane jest przed każdym przebiegiem, poza pomiarem czasu i pamięci.
+    """
+    best_time, result = None, None
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - start
+        best_time = elapsed if best_time is None else min(best_time, elapsed)
+    if setup:
+        setup()
+    tracemalloc.start()
+    function()
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, best_time, peak_memory
+
+def run_benchmarks(project_dir, repeat=1, workers=None):
+    """Mierzy kolejne etapy potoku na parze folderów `project_dir`/old i `project_dir`/new."""
+    project_dir = Path(project_dir)
+    folder_old, folder_new = project_dir / "old", project_dir / "new"
+    results = {}
+    silent = io.StringIO()
+
+    def record(phase, function, setup=None, **extra):
+        value, seconds, peak = _measure(function, repeat, setup)
+        results[phase] = dict({'seconds': round(seconds, 6), 'peak_memory_bytes': peak}, **extra)
+        print(f"  {phase:<32} {seconds:>10.4f} s  {peak / 1024 / 1024:>9.2f} MiB")
+        return value
+
+    new_files = list(lc.get_lookml_files(folder_new).values())
+    total_bytes = sum(os.path.getsize(path) for path in new_files)
+    record('parse_lookml_file', lambda: [lc.parse_lookml_file(path) for path in new_files],
+           files=len(new_files), bytes=total_bytes)
+
+    compared = record('compare_lookml_folders', lambda: lc.compare_lookml_folders(folder_old, folder_new, workers=workers))
+    comparison_results, missing_in_new, missing_in_old = compared
+
+    changes = record('_get_all_changes_as_list', lambda: lc._get_all_changes_as_list(comparison_results, missing_in_new, missing_in_old, folder_old, folder_new))
+    results['_get_all_changes_as_list']['rows'] = len(changes)
+
+    def console_report():
+        silent.seek(0)
+        silent.truncate()
+        with redirect_stdout(silent):
+            lc.generate_consolidated_report(comparison_results, missing_in_new, missing_in_old)
+    record('generate_consolidated_report', console_report)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        html_file = Path(tmp) / "report.html"
+        def html_report():
+            with redirect_stdout(silent):
+                lc.generate_html_table_report(comparison_results, missing_in_new, missing_in_old, output_file=html_file)
+        record('generate_html_table_report', html_report)
+        results['generate_html_table_report']['bytes'] = html_file.stat().st_size
+
+        element_changes = [c for c in changes if c.element_type != 'plik']
+        merge_dir = Path(tmp) / "merge"
+
+        def reset_merge_dir():
+            shutil.rmtree(merge_dir, ignore_errors=True)
+            shutil.copytree(folder_new, merge_dir)
+
+        def apply_one_by_one():
+            with redirect_stdout(silent):
+                for change in element_changes:
+                    lc.apply_changes_to_file(merge_dir / change.filename, [change])
+        record('apply_changes_to_file', apply_one_by_one, setup=reset_merge_dir, changes=len(element_changes))
+
+        def apply_legacy():
+            with redirect_stdout(silent):
+                for change in element_changes:
+                    if change.action_type == 'zmienione_atrybut':
+                        old_data, new_data = change.old_value, {
+                            'value': change.new_value, 'element_type': lc.ELEMENT_TYPES[change.element_type],
+                            'attribute': change.attribute, 'element': change.new_element, 'old_element': change.old_element}
+                    else:
+                        old_data, new_data = change.old_element, change.new_element
+                    lc.apply_change_to_file(merge_dir / change.filename, change.action_type, change.element_name, old_data, new_data)
+        record('apply_change_to_file', apply_legacy, setup=reset_merge_dir, changes=len(element_changes))
+
+        def apply_batched():
+            with redirect_stdout(silent):
+                lc.apply_merge_decisions(merge_dir, element_changes)
+        record('apply_merge_decisions', apply_batched, setup=reset_merge_dir, changes=len(element_changes))
+
+    return results
+
+def compare_with_baseline(current, baseline):
+    """Wypisuje stosunek czasów i pamięci bieżącego pomiaru do wyników zapisanych wcześniej."""
+    print(f"\n{'Etap':<32} {'czas':>10} {'pamięć':>10}")
+    for phase, values in current['results'].items():
+        previous = baseline.get('results', {}).get(phase)
+        if not previous:
+            print(f"{phase:<32} {'(brak)':>10} {'(brak)':>10}")
+            continue
+        time_ratio = values['seconds'] / previous['seconds'] if previous['seconds'] else float('inf')
+        memory_ratio = values['peak_memory_bytes'] / previous['peak_memory_bytes'] if previous['peak_memory_bytes'] else float('inf')
+        print(f"{phase:<32} {time_ratio:>9.2f}x {memory_ratio:>9.2f}x")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark porównywarki LookML na syntetycznym projekcie.")
+    parser.add_argument('--views', type=int, default=200)
+    parser.add_argument('--fields', type=int, default=30, help="Liczba pól na widok")
+    parser.add_argument('--nesting-depth', type=int, default=2, help="Głębokość podkatalogów z widokami")
+    parser.add_argument('--change-rate', type=float, default=0.02, help="Odsetek zmienionych pól")
+    parser.add_argument('--change-kinds', default=",".join(CHANGE_KINDS), help="Rodzaje zmian, rozdzielone przecinkami")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--repeat', type=int, default=1, help="Liczba powtórzeń (zapisywany jest najlepszy czas)")
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--project-dir', default=None, help="Katalog na wygenerowany projekt (domyślnie tymczasowy)")
+    parser.add_argument('--output', default=None, help="Plik JSON z wynikami")
+    parser.add_argument('--baseline', default=None, help="Plik JSON z wcześniejszymi wynikami do porównania")
+    args = parser.parse_args(argv)
+
+    change_kinds = tuple(kind for kind in args.change_kinds.split(",") if kind)
+    unknown = set(change_kinds) - set(CHANGE_KINDS)
+    if unknown:
+        parser.error(f"Nieznane rodzaje zmian: {sorted(unknown)}")
+
+    project_dir = Path(args.project_dir) if args.project_dir else Path(tempfile.mkdtemp(prefix="lookml_bench_"))
+    try:
+        print(f"Generowanie projektu w {project_dir}...")
+        params = generate_project_pair(project_dir, args.views, args.fields, args.nesting_depth, args.change_rate, change_kinds, args.seed)
+        print(f"Wprowadzone zmiany: {params['changes_made']}")
+        print("Pomiary:")
+        report = {
+            'lookml_comparison_version': lc.PARSER_VERSION,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'params': dict(params, repeat=args.repeat, workers=args.workers),
+            'results': run_benchmarks(project_dir, args.repeat, args.workers)
+        }
+    finally:
+        if not args.project_dir:
+            shutil.rmtree(project_dir, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"\nZapisano wyniki: {args.output}")
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            compare_with_baseline(report, json.load(f))
+    return report
+
+if __name__ == "__main__":
+    main()
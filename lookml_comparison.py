@@ -12,120 +12,906 @@ import re
 import sys
 import shutil
 from pathlib import Path
-from collections import defaultdict
+from collections import defaultdict, Counter, deque
 import html # Dodano import modułu html
+import json
+import hashlib
+import fnmatch
+import csv
+from functools import partial, lru_cache
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from contextlib import contextmanager
+import time
+import mmap
+import queue
+import random
+import zlib
+import subprocess
 
-# --- Funkcje z v3.x (rdzeń interaktywny i parser) ---
+# --- Metryki etapów i profilowanie ---
+
+# Aktywny zbiór metryk (None = instrumentacja wyłączona, bez narzutu poza jednym sprawdzeniem).
+_active_metrics = None
+
+def _new_metrics():
+    return {'phases': {}, 'files': {}, 'counters': {}}
+
+def _add_phase_time(name, seconds):
+    if _active_metrics is not None:
+        _active_metrics['phases'][name] = _active_metrics['phases'].get(name, 0.0) + seconds
 
-def parse_lookml_file(file_path):
+def _add_counter(name, value=1):
+    if _active_metrics is not None:
+        _active_metrics['counters'][name] = _active_metrics['counters'].get(name, 0) + value
+
+@contextmanager
+def _timed_phase(name):
+    if _active_metrics is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _add_phase_time(name, time.perf_counter() - start)
+
+def _timed_iter(iterable, name):
+    """Przepuszcza elementy `iterable`, doliczając do etapu `name` czas ich wytwarzania."""
+    iterator = iter(iterable)
+    while True:
+        start = time.perf_counter()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            _add_phase_time(name, time.perf_counter() - start)
+            return
+        _add_phase_time(name, time.perf_counter() - start)
+        yield item
+
+WORKER_PHASE_PREFIX = 'worker_cpu.'
+
+def _merge_metrics(target, source):
     """
-    Parsuje plik LookML, ekstraktując elementy, ich właściwości oraz surowy blok kodu.
+    Dołącza metryki zebrane w procesie puli do metryk procesu głównego. Czasy etapów procesów puli
+    sumowane są pod osobnymi kluczami 'worker_cpu.<etap>', aby nie mieszały się z czasem rzeczywistym etapów.
     """
-    with open(file_path, 'r', encoding='utf-8') as file:
-        content = file.read()
+    if target is None or not source:
+        return
+    for name, seconds in source['phases'].items():
+        name = WORKER_PHASE_PREFIX + name
+        target['phases'][name] = target['phases'].get(name, 0.0) + seconds
+    for name, value in source['counters'].items():
+        target['counters'][name] = target['counters'].get(name, 0) + value
+    target['files'].update(source['files'])
 
-    elements = {
-        'dimensions': {},
-        'measures': {},
-        'dimension_groups': {},
-        'sets': {},
-        'drills': {},
-        'filters': {},
-        'parameters': {}
+def metrics_summary(metrics, slowest=20):
+    """Podsumowanie metryk w formie gotowej do zapisu jako JSON."""
+    files = metrics['files']
+    slowest_files = sorted(files.items(), key=lambda item: item[1]['parse_seconds'], reverse=True)[:slowest]
+    return {
+        'phases_seconds': {name: round(seconds, 6) for name, seconds in sorted(metrics['phases'].items())},
+        'counters': dict(sorted(metrics['counters'].items())),
+        'files_parsed': len(files),
+        'bytes_read': sum(f['bytes'] for f in files.values()),
+        'elements_parsed': sum(f['elements'] for f in files.values()),
+        'parse_seconds_total': round(sum(f['parse_seconds'] for f in files.values()), 6),
+        'slowest_files': [dict(path=path, **values) for path, values in slowest_files],
+        **({'tracemalloc': metrics['tracemalloc']} if 'tracemalloc' in metrics else {})
     }
 
-    patterns = {
-        'dimension': r'(dimension:\s*(\w+)\s*\{([^{}]*(?:\{[^{}]*\}[^{}]*)*)\})',
-        'measure': r'(measure:\s*(\w+)\s*\{([^{}]*(?:\{[^{}]*\}[^{}]*)*)\})',
-        'dimension_group': r'(dimension_group:\s*(\w+)\s*\{([^{}]*(?:\{[^{}]*\}[^{}]*)*)\})',
-        'set': r'(set:\s*(\w+)\s*\{([^{}]*(?:\{[^{}]*\}[^{}]*)*)\})',
-        'drill': r'(drill:\s*(\w+)\s*\{([\s\S]*?)\})',
-        'filter': r'(filter:\s*(\w+)\s*\{([^{}]*(?:\{[^{}]*\}[^{}]*)*)\})',
-        'parameter': r'(parameter:\s*(\w+)\s*\{([^{}]*(?:\{[^{}]*\}[^{}]*)*)\})'
-    }
+@contextmanager
+def instrumentation(metrics_file=None, profile=None, profile_output="lookml_profile.pstats"):
+    """
+    Włącza pomiary etapów (czas na etap, czas parsowania i rozmiar każdego pliku, liczba elementów,
+    najwolniejsze pliki) i po zakończeniu zapisuje ich podsumowanie JSON do `metrics_file`.
+    `profile='cprofile'` uruchamia blok pod cProfile (statystyki zapisywane do `profile_output`),
+    `profile='tracemalloc'` dołącza do metryk szczytowe zużycie pamięci i największe miejsca alokacji.
+    """
+    global _active_metrics
+    if profile not in (None, 'cprofile', 'tracemalloc'):
+        raise ValueError(f"Nieznany tryb profilowania {profile!r}; dostępne: 'cprofile', 'tracemalloc'.")
+    previous_metrics = _active_metrics
+    metrics = _new_metrics() if (metrics_file or profile) else None
+    if metrics is not None:
+        _active_metrics = metrics
+    profiler = None
+    if profile == 'cprofile':
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+    elif profile == 'tracemalloc':
+        import tracemalloc
+        tracemalloc.start(10)
+    start = time.perf_counter()
+    try:
+        yield metrics
+    finally:
+        if metrics is not None:
+            metrics['phases']['total'] = time.perf_counter() - start
+        if profiler is not None:
+            import pstats
+            profiler.disable()
+            profiler.dump_stats(profile_output)
+            pstats.Stats(profiler).sort_stats('cumulative').print_stats(20)
+            print(f"Zapisano profil cProfile: {profile_output}")
+        elif profile == 'tracemalloc':
+            snapshot = tracemalloc.take_snapshot()
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            metrics['tracemalloc'] = {
+                'peak_bytes': peak,
+                'top_allocations': [{'location': str(stat.traceback[0]), 'bytes': stat.size, 'count': stat.count}
+                                    for stat in snapshot.statistics('lineno')[:10]]
+            }
+        _active_metrics = previous_metrics
+        if metrics_file:
+            with open(metrics_file, 'w', encoding='utf-8') as f:
+                json.dump(metrics_summary(metrics), f, indent=2, ensure_ascii=False)
+            print(f"Zapisano metryki: {metrics_file}")
+
+# --- Funkcje z v3.x (rdzeń interaktywny i parser) ---
+
+# Wersja formatu wyniku parsera; zmiana unieważnia wszystkie wyniki zapisane poza procesem.
+PARSER_VERSION = "4.7"
+
+# Rodzaje elementów LookML i klucze, pod którymi trafiają do słownika `elements`.
+ELEMENT_TYPES = {
+    'dimension': 'dimensions',
+    'measure': 'measures',
+    'dimension_group': 'dimension_groups',
+    'set': 'sets',
+    'drill': 'drills',
+    'filter': 'filters',
+    'parameter': 'parameters'
+}
+
+# Jeden wzorzec wyszukujący kolejny istotny fragment: komentarz, napis, klamrę lub klucz właściwości.
+_TOKEN_RE = re.compile(r'#[^\n]*|"(?:[^"\\]|\\.)*"?|\{|\}|([+\w]+)[ \t]*:', re.DOTALL)
+_STRING_RE = re.compile(r'"((?:[^"\\]|\\.)*)"?', re.DOTALL)
+_LIST_END_RE = re.compile(r'"(?:[^"\\]|\\.)*"?|\]', re.DOTALL)
+_NAMED_BLOCK_RE = re.compile(r'(\+?[\w.]+)\s*\{')
+# Wartość bez cudzysłowu: słowa do końca linii, ale nie dalej niż do kolejnego klucza, `}` lub komentarza.
+_UNQUOTED_RE = re.compile(r'(?:[^\s}#][^\s}]*(?:[ \t]+(?![+\w]+[ \t]*:|#)[^\s}]+)*)?')
+_WHITESPACE_RE = re.compile(r'\s*')
+
+_KIND_ORDER = {kind: position for position, kind in enumerate(ELEMENT_TYPES.values())}
+
+def _decode_lookml(data):
+    # Normalizacja końców linii jak przy open(..., 'r'), aby tekst bloków pasował do treści plików czytanych tekstowo.
+    return data.decode('utf-8').replace('\r\n', '\n').replace('\r', '\n')
+
+def _check_source_unchanged(path, stat, size, mtime_ns):
+    if stat.st_size != size or stat.st_mtime_ns != mtime_ns:
+        raise OSError(f"Plik źródłowy zmienił się od czasu parsowania: {path}")
+
+@lru_cache(maxsize=64)
+def _mapped_file(path, size, mtime_ns):
+    with open(path, 'rb') as f:
+        _check_source_unchanged(path, os.fstat(f.fileno()), size, mtime_ns)
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+@lru_cache(maxsize=8)
+def _decoded_file(path, size, mtime_ns):
+    with open(path, 'rb') as f:
+        _check_source_unchanged(path, os.fstat(f.fileno()), size, mtime_ns)
+        return _decode_lookml(f.read())
+
+class LookMLSource:
+    """
+    Plik, z którego sparsowano elementy. Elementy nie przechowują kopii swojego tekstu, tylko
+    zakres (początek, koniec) w tym pliku; tekst czytany jest na żądanie - przez mmap, gdy pozycje
+    znakowe są zarazem bajtowymi (ASCII bez '\\r'), w przeciwnym razie z ponownie odczytanego pliku.
+    """
+    __slots__ = ('path', 'size', 'mtime_ns', 'byte_offsets')
+
+    def __init__(self, path, size, mtime_ns, byte_offsets):
+        self.path = path
+        self.size = size
+        self.mtime_ns = mtime_ns
+        self.byte_offsets = byte_offsets
+
+    def read(self, start, end):
+        if self.size == 0:
+            return ''
+        if self.byte_offsets:
+            return _mapped_file(self.path, self.size, self.mtime_ns)[start:end].decode('ascii')
+        return _decoded_file(self.path, self.size, self.mtime_ns)[start:end]
+
+class _TextSource:
+    """Źródło dla tekstu parsowanego bezpośrednio z pamięci (np. pliku docelowego łączenia)."""
+    __slots__ = ('content',)
+
+    def __init__(self, content):
+        self.content = content
+
+    def read(self, start, end):
+        return self.content[start:end]
+
+@dataclass(slots=True)
+class LookMLElement:
+    """Sparsowany element LookML wraz z położeniem w tekście źródłowym."""
+    kind: str  # Klucz rodzaju w słowniku elementów, np. 'dimensions'
+    name: str
+    properties: dict
+    source: object = field(compare=False, repr=False)  # LookMLSource lub _TextSource
+    span: tuple = None  # (początek, koniec) bloku w pliku
+    property_spans: dict = None  # {właściwość: (początek, początek wartości, koniec wartości, koniec)}
+    parent: str = None  # Nazwa bloku nadrzędnego (np. widoku)
+    digest: bytes = None  # Skrót znormalizowanej treści (patrz _element_digest)
+    references: tuple = ()  # Pola, do których odwołuje się element, jako 'widok.pole' (patrz _element_references)
+
+    @property
+    def raw_block(self):
+        """Surowy tekst bloku, czytany ze źródła dopiero przy pierwszym użyciu."""
+        return self.source.read(*self.span)
+
+class ParsedElements(dict):
+    """
+    Wynik parsowania pliku: {rodzaj: {nazwa: LookMLElement}} z indeksem nazwa -> rodzaj
+    i liczbą elementów, budowanymi raz podczas parsowania.
+    """
+    __slots__ = ('kinds', 'element_count', '_kind_digests')
+
+    def __init__(self):
+        super().__init__((kind, {}) for kind in ELEMENT_TYPES.values())
+        self.kinds = {}
+        self.element_count = 0
+        self._kind_digests = None
+
+    def add(self, element):
+        elements = self[element.kind]
+        if element.name not in elements:
+            self.element_count += 1
+        elements[element.name] = element
+        # Przy tej samej nazwie w kilku rodzajach obowiązuje kolejność ELEMENT_TYPES
+        current_kind = self.kinds.get(element.name)
+        if current_kind is None or _KIND_ORDER[element.kind] < _KIND_ORDER[current_kind]:
+            self.kinds[element.name] = element.kind
+
+    def kind_of(self, name):
+        return self.kinds.get(name)
+
+    def kind_digest(self, kind):
+        """Łączny skrót (drzewo Merkle) wszystkich elementów danego rodzaju: nazw, bloków nadrzędnych i skrótów treści."""
+        if self._kind_digests is None:
+            self._kind_digests = {}
+            for element_kind, elements in self.items():
+                digest = hashlib.blake2b(digest_size=16)
+                for name in sorted(elements):
+                    parent = elements[name].parent or ''
+                    digest.update(f"{name}\0{parent}\0".encode('utf-8') + elements[name].digest)
+                self._kind_digests[element_kind] = digest.digest()
+        return self._kind_digests[kind]
+
+    @property
+    def digest(self):
+        """Skrót całego pliku, złożony ze skrótów rodzajów elementów."""
+        digest = hashlib.blake2b(digest_size=16)
+        for kind in ELEMENT_TYPES.values():
+            digest.update(self.kind_digest(kind))
+        return digest.digest()
+
+def _empty_elements():
+    return ParsedElements()
+
+# Kolejne wystąpienia powtarzalnej właściwości (link, allowed_value, when, action...) zapisywane są
+# pod kluczami z numerem: 'link', 'link#2', 'link#3'...
+_REPEAT_SEPARATOR = '#'
+
+def _property_key(properties, key):
+    """Klucz, pod którym zapisywane jest kolejne wystąpienie właściwości `key`."""
+    if key not in properties:
+        return key
+    index = 2
+    while f"{key}{_REPEAT_SEPARATOR}{index}" in properties:
+        index += 1
+    return f"{key}{_REPEAT_SEPARATOR}{index}"
+
+def _base_property(key):
+    """Nazwa właściwości bez numeru wystąpienia ('link#2' -> 'link')."""
+    return key.split(_REPEAT_SEPARATOR, 1)[0]
+
+def _is_sql_property(key):
+    """Właściwości zakończone `;;` (sql, sql_on, html, expression...) czytane są jako surowy tekst."""
+    return key.startswith('sql') or key.endswith('_sql') or key in ('html', 'expression')
 
-    for element_type, pattern in patterns.items():
-        for match in re.finditer(pattern, content, re.DOTALL):
-            raw_block, name, body = match.group(1), match.group(2), match.group(3)
-            properties = extract_properties(body)
-            key = 'dimension_groups' if element_type == 'dimension_group' else element_type + 's'
-            elements[key][name] = {'properties': properties, 'raw_block': raw_block.strip()}
+# Właściwości listowe, których kolejność nie ma znaczenia; pozostałe listy (np. drill_fields) zachowują kolejność.
+_UNORDERED_LIST_PROPERTIES = frozenset({'timeframes', 'intervals', 'fields', 'tags'})
+_LIST_PROPERTIES = _UNORDERED_LIST_PROPERTIES | {'drill_fields', 'suggestions', 'filters', 'sorts'}
+_SQL_WHITESPACE_RE = re.compile(r"""('(?:[^'\\]|\\.)*'|"(?:[^"\\]|\\.)*")|\s+""")
+_LIST_ITEM_RE = re.compile(r'"((?:[^"\\]|\\.)*)"|([^,\s][^,]*)')
+
+def _normalize_property(key, value):
+    """
+    Postać kanoniczna wartości właściwości, odporna na zmiany kosmetyczne: białe znaki
+    (w SQL poza literałami napisowymi), cudzysłowy elementów list i kolejność list nieuporządkowanych.
+    """
+    key = _base_property(key)
+    if _is_sql_property(key):
+        return _SQL_WHITESPACE_RE.sub(lambda m: m.group(1) or ' ', value).strip()
+    if key in _LIST_PROPERTIES:
+        items = [m.group(1) if m.group(1) is not None else m.group(2).strip() for m in _LIST_ITEM_RE.finditer(value)]
+        if key in _UNORDERED_LIST_PROPERTIES:
+            items.sort()
+        return ', '.join(items)
+    return ' '.join(value.split())
+
+def _element_digest(properties):
+    digest = hashlib.blake2b(digest_size=16)
+    for key in sorted(properties):
+        digest.update(f"{key}\0{_normalize_property(key, properties[key])}\0".encode('utf-8'))
+    return digest.digest()
+
+# Odwołania do pól: ${pole}, ${widok.pole}, {{ widok.pole._value }}, {% condition widok.pole %}
+_FIELD_REFERENCE_RE = re.compile(r'\$\{\s*([\w.]+)\s*\}|\{\{\s*([\w.]+)|\{%\s*(?:condition|parameter|date_start|date_end)\s+([\w.]+)')
+# Pozycja listy filters: [pole: "wartość", ...] - klucz tylko na początku pozycji, poza cudzysłowami
+_FILTER_ITEM_RE = re.compile(r'\s*([\w.]+)\s*:\s*(?:"(?:[^"\\]|\\.)*"|[^,"]*)\s*(?:,|$)')
+_FILTER_BLOCK_FIELD_RE = re.compile(r'\s*field\s*:\s*([\w.]+)')  # Dawna postać filters: { field: pole value: "..." }
+_NON_FIELD_REFERENCES = frozenset({'TABLE', 'SQL_TABLE_NAME', 'EXTENDED'})
+_LIQUID_VARIABLES = frozenset({'value', 'rendered_value', 'linked_value', 'filterable_value', 'link', 'model',
+                               'view', 'explore', 'field', 'query', 'row', 'parameter_value'})
+
+def _filter_fields(value):
+    block_match = _FILTER_BLOCK_FIELD_RE.match(value)
+    if block_match:
+        return [block_match.group(1)]
+    names, pos = [], 0
+    while pos < len(value):
+        item_match = _FILTER_ITEM_RE.match(value, pos)
+        if not item_match:
+            break
+        names.append(item_match.group(1))
+        pos = item_match.end()
+    return names
+
+def _element_references(properties, view):
+    """
+    Zwraca posortowaną krotkę pól ('widok.pole'), do których odwołują się właściwości elementu:
+    wyrażenia ${...} i Liquid w SQL/HTML/linkach, listy fields/drill_fields (także zbiory 'nazwa*')
+    oraz pola w filters. Nazwy bez widoku odnoszą się do widoku elementu; sufiksy w rodzaju ._sql są pomijane.
+    """
+    view = view.lstrip('+') if view else view  # Udoskonalenia (view: +orders) dotyczą pól tego samego widoku
+    references = set()
+    for key, value in properties.items():
+        key = _base_property(key)
+        if key in ('fields', 'drill_fields'):
+            names = [m.group(1) if m.group(1) is not None else m.group(2).strip() for m in _LIST_ITEM_RE.finditer(value)]
+            names = [name.lstrip('-').rstrip('*') for name in names if name != 'ALL_FIELDS*']
+        elif key == 'filters':
+            names = _filter_fields(value)
+        else:
+            names = []
+            for m in _FIELD_REFERENCE_RE.finditer(value):
+                if m.group(2) is not None and m.group(2).split('.')[0] in _LIQUID_VARIABLES:
+                    continue
+                names.append(m.group(1) or m.group(2) or m.group(3))
+        for name in names:
+            parts = [part for part in name.split('.') if part and not part.startswith('_')]
+            if not parts or any(part in _NON_FIELD_REFERENCES for part in parts):
+                continue
+            parts = parts[:2]
+            references.add('.'.join(parts) if len(parts) == 2 or view is None else f"{view}.{parts[0]}")
+    return tuple(sorted(references))
+
+def _strip_span(content, start, end):
+    """Zwraca zakres [start, end) bez białych znaków na brzegach."""
+    segment = content[start:end]
+    stripped = segment.lstrip()
+    start += len(segment) - len(stripped)
+    return start, start + len(stripped.rstrip())
+
+def _scan_lookml(content, elements=None, root_properties=None, blocks=None, source=None):
+    """
+    Jednoprzebiegowy parser LookML o liniowym czasie działania.
+    Zamiast osobnych wyrażeń regularnych dla każdego rodzaju elementu i każdej właściwości
+    czyta tekst raz, utrzymując stos otwartych bloków, dzięki czemu obsługuje dowolną głębokość
+    zagnieżdżenia, a klamry wewnątrz napisów i bloków SQL nie psują struktury.
+    Każda właściwość elementu zapisywana jest generycznie pod własną nazwą, a jej kolejne wystąpienia
+    (np. kilka bloków link lub allowed_value) pod nazwami z numerem: 'link#2', 'link#3'...
+    Elementy zapamiętują położenie w tekście ('span'), położenie każdej właściwości
+    ('property_spans': [początek, początek wartości, koniec wartości, koniec]) oraz nazwę bloku
+    nadrzędnego ('parent'). Opcjonalny słownik `blocks` otrzymuje zakresy pozostałych nazwanych
+    bloków, np. {('view', 'orders'): (początek, koniec)}. Tekst elementów czytany jest na żądanie
+    ze `source` (domyślnie z samego `content`).
+    """
+    if elements is not None and source is None:
+        source = _TextSource(content)
+    # Ramka stosu: [klucz, nazwa, początek bloku, początek ciała, właściwości lub None, zakresy właściwości, rodzic]
+    stack = [[None, None, 0, 0, root_properties, {}, None]]
+    length = len(content)
+    pos = 0
+    while pos < length:
+        match = _TOKEN_RE.search(content, pos)
+        if not match:
+            break
+        token = match.group(0)
+        pos = match.end()
+        if token == '{':
+            stack.append([None, None, match.start(), pos, None, None, stack[-1][1]])
+            continue
+        if token == '}':
+            if len(stack) > 1:
+                key, name, start, body_start, properties, property_spans, parent = stack.pop()
+                if name is not None and key in ELEMENT_TYPES:
+                    if elements is not None:
+                        elements.add(LookMLElement(ELEMENT_TYPES[key], name, properties, source,
+                                                   (start, pos), property_spans, parent, _element_digest(properties),
+                                                   _element_references(properties, parent)))
+                elif name is not None:
+                    if blocks is not None:
+                        blocks[(key, name)] = (start, pos)
+                elif key is not None and stack[-1][4] is not None:
+                    value_start, value_end = _strip_span(content, body_start, match.start())
+                    key = _property_key(stack[-1][4], key)
+                    stack[-1][4][key] = content[value_start:value_end]
+                    stack[-1][5][key] = (start, value_start, value_end, pos)
+            continue
+        key = match.group(1)
+        if key is None:  # Komentarz lub luźny napis
+            continue
+
+        key_start = match.start()
+        pos = _WHITESPACE_RE.match(content, pos).end()
+        value_start = None
+        if _is_sql_property(key):
+            end = content.find(';;', pos)
+            if end == -1:
+                end = length
+            value_start, value_end = _strip_span(content, pos, end)
+            pos = min(end + 2, length)
+        elif content.startswith('"', pos):
+            string_match = _STRING_RE.match(content, pos)
+            value_start, value_end = string_match.span(1)
+            pos = string_match.end()
+        elif content.startswith('[', pos):
+            list_start = pos
+            while True:
+                end_match = _LIST_END_RE.search(content, pos)
+                if not end_match:
+                    pos = length
+                    break
+                pos = end_match.end()
+                if end_match.group(0) == ']':
+                    break
+            value_start, value_end = _strip_span(content, list_start + 1, pos - 1 if content[pos - 1:pos] == ']' else pos)
+        elif content.startswith('{', pos):
+            stack.append([key, None, key_start, pos + 1, None, None, stack[-1][1]])
+            pos += 1
+        else:
+            block_match = _NAMED_BLOCK_RE.match(content, pos)
+            if block_match:
+                is_element = key in ELEMENT_TYPES
+                stack.append([key, block_match.group(1), key_start, block_match.end(),
+                              {} if is_element else None, {} if is_element else None, stack[-1][1]])
+                pos = block_match.end()
+            else:
+                value_match = _UNQUOTED_RE.match(content, pos)
+                value_start, value_end = value_match.span()
+                pos = value_end
+        properties = stack[-1][4]
+        if value_start is not None and properties is not None:
+            key = _property_key(properties, key)
+            properties[key] = content[value_start:value_end]
+            stack[-1][5][key] = (key_start, value_start, value_end, pos)
     return elements
 
+def parse_lookml_file(file_path, cache_dir=None):
+    """
+    Parsuje plik LookML, ekstraktując elementy, ich właściwości oraz położenie bloków kodu.
+    Surowe bloki nie są kopiowane - elementy wskazują zakresy w pliku czytane na żądanie (LookMLSource).
+    Jeśli podano `cache_dir`, wynik jest pobierany z / zapisywany do pamięci podręcznej parsera.
+    """
+    start = time.perf_counter()
+    with open(file_path, 'rb') as file:
+        data = file.read()
+        stat = os.fstat(file.fileno())
+    source = LookMLSource(os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns,
+                          data.isascii() and b'\r' not in data)
+    if cache_dir is None:
+        elements = _parse_lookml_bytes(data, source)
+    else:
+        elements = _parse_lookml_bytes_cached(data, Path(cache_dir), source)
+    if _active_metrics is not None:
+        elapsed = time.perf_counter() - start
+        _add_phase_time('parse', elapsed)
+        _active_metrics['files'][str(file_path)] = {
+            'parse_seconds': round(elapsed, 6), 'bytes': len(data), 'elements': elements.element_count
+        }
+    return elements
+
+def _parse_lookml_bytes(data, source=None):
+    return _scan_lookml(_decode_lookml(data), elements=_empty_elements(), source=source)
+
 def extract_properties(body):
     """
     Ekstraktuje właściwości z ciała elementu LookML.
     """
     properties = {}
-    property_patterns = {
-        'type': r'type:\s*([^\n\r]+)',
-        'sql': r'sql:\s*([^;]+);?',
-        'label': r'label:\s*"([^"]*)"',
-        'description': r'description:\s*"([^"]*)"',
-        'hidden': r'hidden:\s*(\w+)',
-        'primary_key': r'primary_key:\s*(\w+)',
-        'timeframes': r'timeframes:\s*\[([^\]]+)\]',
-        'convert_tz': r'convert_tz:\s*(\w+)',
-        'datatype': r'datatype:\s*(\w+)',
-        'value_format': r'value_format:\s*"([^"]*)"',
-        'drill_fields': r'drill_fields:\s*\[([^\]]*)\]',
-        'fields': r'fields:\s*\[([^\]]*)\]',
-        'url': r'url:\s*"([^"]*)"',
-        'default_value': r'default_value:\s*"([^"]*)"'
-    }
-    for prop_name, pattern in property_patterns.items():
-        match = re.search(pattern, body, re.DOTALL)
-        if match:
-            properties[prop_name] = match.group(1).strip()
+    _scan_lookml(body, root_properties=properties)
     return properties
 
-def get_lookml_files(folder_path):
+# --- Pamięć podręczna parsera (adresowana treścią pliku) ---
+
+DEFAULT_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+def _parse_cache_key(data):
+    """Klucz wpisu: skrót treści pliku i wersji parsera (zmiana parsera unieważnia cały cache)."""
+    digest = hashlib.sha256(PARSER_VERSION.encode('utf-8') + b'\0')
+    digest.update(data)
+    return digest.hexdigest()
+
+def _elements_to_json(elements):
+    return {kind: [[e.name, e.properties, e.span, e.property_spans, e.parent, e.digest.hex(), e.references] for e in kind_elements.values()]
+            for kind, kind_elements in elements.items()}
+
+def _elements_from_json(data, source):
+    elements = _empty_elements()
+    for kind, kind_elements in data.items():
+        for name, properties, span, property_spans, parent, digest, references in kind_elements:
+            elements.add(LookMLElement(kind, name, properties, source, tuple(span),
+                                       {k: tuple(v) for k, v in property_spans.items()}, parent, bytes.fromhex(digest), tuple(references)))
+    return elements
+
+def _parse_lookml_bytes_cached(data, cache_dir, source):
+    cache_file = cache_dir / f"{_parse_cache_key(data)}.json"
+    try:
+        with open(cache_file, 'r', encoding='utf-8') as f:
+            elements = _elements_from_json(json.load(f), source)
+        os.utime(cache_file)  # Odświeżenie czasu modyfikacji = ostatnie użycie (LRU)
+        _add_counter('parse_cache_hits')
+        return elements
+    except (OSError, ValueError):
+        pass
+
+    elements = _parse_lookml_bytes(data, source)
+    _add_counter('parse_cache_misses')
+    try:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        tmp_file = cache_file.with_name(f"{cache_file.name}.{os.getpid()}.tmp")
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(_elements_to_json(elements), f, ensure_ascii=False)
+        os.replace(tmp_file, cache_file)
+    except OSError as e:
+        print(f"Ostrzeżenie: Nie udało się zapisać cache parsera ({cache_file}): {e}")
+    return elements
+
+def prune_parse_cache(cache_dir, max_bytes=DEFAULT_CACHE_MAX_BYTES):
+    """Usuwa najdawniej używane wpisy cache, dopóki łączny rozmiar przekracza `max_bytes`."""
+    cache_dir = Path(cache_dir)
+    if not cache_dir.is_dir():
+        return
+    entries = []
+    total_size = 0
+    with os.scandir(cache_dir) as it:
+        for entry in it:
+            if entry.is_file() and entry.name.endswith('.json'):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total_size += stat.st_size
+    for _, size, path in sorted(entries):
+        if total_size <= max_bytes:
+            break
+        try:
+            os.remove(path)
+            total_size -= size
+        except OSError:
+            pass
+
+def clear_parse_cache(cache_dir):
+    """Usuwa całą zawartość pamięci podręcznej parsera."""
+    cache_dir = Path(cache_dir)
+    if cache_dir.exists():
+        shutil.rmtree(cache_dir)
+        print(f"Wyczyszczono cache parsera: {cache_dir}")
+
+# --- Pomijanie plików identycznych (rozmiar + skrót treści, opcjonalny manifest) ---
+
+MANIFEST_VERSION = 1
+
+def _file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _manifest_path(manifest_dir, folder_path):
+    """Manifest folderu zapisywany jest pod skrótem jego ścieżki bezwzględnej."""
+    folder_key = hashlib.sha1(str(Path(folder_path).resolve()).encode('utf-8')).hexdigest()[:16]
+    return Path(manifest_dir) / f"manifest_{folder_key}.json"
+
+def load_file_manifest(manifest_file):
+    """Wczytuje manifest {plik: [rozmiar, mtime_ns, skrót]}; przy braku lub błędzie zwraca pusty słownik."""
+    try:
+        with open(manifest_file, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if data.get('version') != MANIFEST_VERSION:
+        return {}
+    return data.get('files', {})
+
+def save_file_manifest(manifest_file, manifest):
+    manifest_file = Path(manifest_file)
+    try:
+        manifest_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp_file = manifest_file.with_name(f"{manifest_file.name}.{os.getpid()}.tmp")
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump({'version': MANIFEST_VERSION, 'files': manifest}, f)
+        os.replace(tmp_file, manifest_file)
+    except OSError as e:
+        print(f"Ostrzeżenie: Nie udało się zapisać manifestu {manifest_file}: {e}")
+
+def _manifest_digest(filename, path, stat, old_manifest, new_manifest):
+    """Zwraca skrót pliku z manifestu, jeśli rozmiar i mtime się nie zmieniły; w przeciwnym razie liczy go od nowa."""
+    entry = old_manifest.get(filename)
+    if entry and entry[0] == stat.st_size and entry[1] == stat.st_mtime_ns:
+        digest = entry[2]
+    else:
+        digest = _file_digest(path)
+    new_manifest[filename] = [stat.st_size, stat.st_mtime_ns, digest]
+    return digest
+
+def _drop_identical_files(file_pairs, folder_old, folder_new, manifest_dir=None):
+    """
+    Odrzuca pary plików o identycznej treści, zanim trafią do parsera (generator po parach
+    (plik, ścieżka_old, ścieżka_new)). Najpierw porównywane są rozmiary, a dopiero przy równych
+    rozmiarach skróty treści. Manifesty zapisywane są po wyczerpaniu strumienia par.
+    """
+    old_manifest = new_manifest = {}
+    if manifest_dir is not None:
+        old_manifest = load_file_manifest(_manifest_path(manifest_dir, folder_old))
+        new_manifest = load_file_manifest(_manifest_path(manifest_dir, folder_new))
+    updated_old, updated_new = {}, {}
+
+    for filename, old_path, new_path in file_pairs:
+        with _timed_phase('identical_check'):
+            try:
+                old_stat, new_stat = os.stat(old_path), os.stat(new_path)
+                identical = (old_stat.st_size == new_stat.st_size and
+                             _manifest_digest(filename, old_path, old_stat, old_manifest, updated_old) ==
+                             _manifest_digest(filename, new_path, new_stat, new_manifest, updated_new))
+            except OSError:
+                identical = False  # Błąd zostanie zgłoszony przy porównaniu pliku
+        if identical:
+            _add_counter('identical_files_skipped')
+        else:
+            yield filename, old_path, new_path
+
+    if manifest_dir is not None:
+        save_file_manifest(_manifest_path(manifest_dir, folder_old), updated_old)
+        save_file_manifest(_manifest_path(manifest_dir, folder_new), updated_new)
+
+# --- Wyszukiwanie plików LookML ---
+
+DEFAULT_INCLUDE_FILES = ('*.lkml',)
+DEFAULT_EXCLUDE_FILES = ('.*',)  # Ukryte pliki i katalogi (np. .ipynb_checkpoints, .git)
+
+def _matches_any(rel_path, name, patterns):
+    return any(fnmatch.fnmatchcase(name, p) or fnmatch.fnmatchcase(rel_path, p) for p in patterns)
+
+def _is_lookml_path(rel_path, include_files, exclude_files):
+    """Odpowiednik filtrów iter_lookml_files dla pojedynczej ścieżki względnej (posix)."""
+    parts = rel_path.split('/')
+    for depth in range(1, len(parts)):
+        if _matches_any('/'.join(parts[:depth]), parts[depth - 1], exclude_files):
+            return False
+    return not _matches_any(rel_path, parts[-1], exclude_files) and _matches_any(rel_path, parts[-1], include_files)
+
+def iter_lookml_files(folder_path, include_files=None, exclude_files=None):
+    """
+    Rekurencyjnie (os.scandir) wyszukuje pliki LookML i zwraca je strumieniowo jako pary
+    (ścieżka względna w formacie posix, Path). Wzorce glob dopasowywane są do nazwy pliku
+    lub ścieżki względnej; wzorce wykluczające pomijają także całe katalogi.
+    """
+    include_files = DEFAULT_INCLUDE_FILES if include_files is None else tuple(include_files)
+    exclude_files = DEFAULT_EXCLUDE_FILES if exclude_files is None else tuple(exclude_files)
+    folder = Path(folder_path)
+    pending_dirs = [(folder, '')]
+    while pending_dirs:
+        directory, prefix = pending_dirs.pop()
+        try:
+            with os.scandir(directory) as it:
+                entries = sorted(it, key=lambda e: e.name)
+        except OSError as e:
+            print(f"Błąd: Nie można odczytać katalogu {directory}: {e}")
+            continue
+        subdirs = []
+        for entry in entries:
+            rel_path = prefix + entry.name
+            if _matches_any(rel_path, entry.name, exclude_files):
+                continue
+            if entry.is_dir():
+                subdirs.append((Path(entry.path), rel_path + '/'))
+            elif entry.is_file() and _matches_any(rel_path, entry.name, include_files):
+                yield rel_path, Path(entry.path)
+        pending_dirs.extend(reversed(subdirs))
+
+def get_lookml_files(folder_path, include_files=None, exclude_files=None):
     folder = Path(folder_path)
     if not folder.is_dir():
         print(f"Błąd: Ścieżka {folder_path} nie jest folderem lub nie istnieje.")
         return {}
-    return {f.name: f for f in folder.glob("*.view.lkml")}
+    return dict(iter_lookml_files(folder, include_files, exclude_files))
 
-def compare_lookml_folders(folder_old, folder_new, include_elements=None, exclude_elements=None, include_types=None, exclude_types=None):
-    old_files, new_files = get_lookml_files(folder_old), get_lookml_files(folder_new)
-    comparison_results = {}
-    common_files = set(old_files.keys()) & set(new_files.keys())
+def _comparison_result(changes, old_elements, new_elements, old_path, new_path):
+    """Wynik porównania jednego pliku - wspólna postać dla folderów, rewizji git, macierzy i trybu obserwacji."""
+    return {
+        'changes': changes,
+        'old_elements_parsed': old_elements,
+        'new_elements_parsed': new_elements,
+        'old_path': old_path,
+        'new_path': new_path
+    }
 
-    for filename in sorted(common_files):
-        old_path, new_path = old_files[filename], new_files[filename]
-        try:
-            old_parsed, new_parsed, changes = compare_files(old_path, new_path, include_elements, exclude_elements, include_types, exclude_types)
-            if changes:
-                comparison_results[filename] = {
-                    'changes': changes,
-                    'old_elements_parsed': old_parsed,
-                    'new_elements_parsed': new_parsed,
-                    'old_path': old_path,
-                    'new_path': new_path
-                }
-        except Exception as e:
-            print(f"Błąd podczas porównywania pliku {filename}: {e}")
+class ComparisonResults(dict):
+    """
+    Wyniki porównania {plik: wynik} z przeniesieniami elementów (detect_moved_elements) wykrywanymi raz,
+    przy pierwszym użyciu, i współdzielonymi przez konsolę, raporty HTML, eksport i łączenie.
+    Każda modyfikacja słownika unieważnia zapamiętany wynik.
+    """
+    __slots__ = ('_moves',)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._moves = None
+
+    def moves(self):
+        if self._moves is None:
+            self._moves = detect_moved_elements(self)
+        return self._moves
+
+def _resetting_moves(name):
+    method = getattr(dict, name)
+    def wrapper(self, *args, **kwargs):
+        self._moves = None
+        return method(self, *args, **kwargs)
+    wrapper.__name__ = name
+    return wrapper
+
+for _name in ('__setitem__', '__delitem__', 'pop', 'popitem', 'setdefault', 'update', 'clear'):
+    setattr(ComparisonResults, _name, _resetting_moves(_name))
+
+def compare_lookml_folders(folder_old, folder_new, include_elements=None, exclude_elements=None, include_types=None, exclude_types=None, cache_dir=None, clear_cache=False, cache_max_bytes=DEFAULT_CACHE_MAX_BYTES, workers=None, skip_identical=True, manifest_dir=None, include_files=None, exclude_files=None, git_repo=None):
+    """
+    Porównuje wspólne pliki obu folderów (rekurencyjnie, kluczem jest ścieżka względna).
+    Pliki z `folder_new` są przekazywane do porównania strumieniowo, w miarę ich odnajdywania.
+    Przy `workers` > 1 pary plików parsowane i porównywane są równolegle w puli procesów;
+    kolejność wyników i komunikaty błędów są takie same jak w trybie szeregowym.
+    Przy `skip_identical` pliki o identycznej treści są pomijane bez parsowania; `manifest_dir` zapisuje
+    manifest skrótów, dzięki któremu kolejne uruchomienie nie liczy skrótów plików o niezmienionym rozmiarze i mtime.
+    Przy `git_repo` `folder_old` i `folder_new` są rewizjami tego repozytorium (patrz compare_git_revisions).
+    """
+    if cache_dir is not None and clear_cache:
+        clear_parse_cache(cache_dir)
+    if git_repo is not None:
+        return compare_git_revisions(git_repo, folder_old, folder_new, include_elements, exclude_elements, include_types, exclude_types,
+                                     cache_dir=cache_dir, cache_max_bytes=cache_max_bytes, include_files=include_files, exclude_files=exclude_files)
+    with _timed_phase('discovery'):
+        old_files = get_lookml_files(folder_old, include_files, exclude_files)
+    new_files = {}
+    if Path(folder_new).is_dir():
+        new_files_iter = _timed_iter(iter_lookml_files(folder_new, include_files, exclude_files), 'discovery')
+    else:
+        print(f"Błąd: Ścieżka {folder_new} nie jest folderem lub nie istnieje.")
+        new_files_iter = iter(())
+
+    def common_pairs():
+        for filename, new_path in new_files_iter:
+            new_files[filename] = new_path
+            if filename in old_files:
+                yield filename, old_files[filename], new_path
+
+    file_pairs = common_pairs()
+    if skip_identical:
+        file_pairs = _drop_identical_files(file_pairs, folder_old, folder_new, manifest_dir)
+    compare_batch = partial(_compare_file_batch, include_elements=include_elements, exclude_elements=exclude_elements,
+                            include_types=include_types, exclude_types=exclude_types, cache_dir=cache_dir)
+
+    outcomes = {}
+    if workers and workers > 1:
+        # Czas rzeczywisty całej sekcji puli; czasy etapów w procesach trafiają do 'worker_cpu.*'
+        with _timed_phase('compare_pool'), ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(compare_batch, batch, collect_metrics=_active_metrics is not None)
+                       for batch in _batched(file_pairs, COMPARE_BATCH_SIZE)]
+            with _timed_phase('compare_wait'):
+                for future in futures:
+                    batch_outcomes, batch_metrics = future.result()
+                    outcomes.update(batch_outcomes)
+                    _merge_metrics(_active_metrics, batch_metrics)
+    else:
+        for file_pair in file_pairs:
+            outcomes.update(compare_batch([file_pair])[0])
+    _add_counter('files_compared', len(outcomes))
+
+    comparison_results = ComparisonResults()
+    for filename in sorted(outcomes):
+        old_path, new_path, result, error = outcomes[filename]
+        if error is not None:
+            print(f"Błąd podczas porównywania pliku {filename}: {error}")
+            continue
+        old_parsed, new_parsed, changes = result
+        if changes:
+            comparison_results[filename] = _comparison_result(changes, old_parsed, new_parsed, old_path, new_path)
+
+    if cache_dir is not None:
+        prune_parse_cache(cache_dir, cache_max_bytes)
 
     missing_in_new = set(old_files.keys()) - set(new_files.keys())
     missing_in_old = set(new_files.keys()) - set(old_files.keys())
     return comparison_results, missing_in_new, missing_in_old
 
-def compare_files(old_file_path, new_file_path, include_elements=None, exclude_elements=None, include_types=None, exclude_types=None):
-    old_elements = parse_lookml_file(old_file_path)
-    new_elements = parse_lookml_file(new_file_path)
+# Liczba par plików przekazywanych jednorazowo do procesu puli.
+COMPARE_BATCH_SIZE = 16
+
+def _batched(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def _compare_file_batch(file_pairs, include_elements=None, exclude_elements=None, include_types=None, exclude_types=None, cache_dir=None, collect_metrics=False):
+    """
+    Porównuje paczkę par (plik, ścieżka_old, ścieżka_new); zwraca ({plik: (old, new, wynik, błąd)}, metryki).
+    Przy `collect_metrics` (proces puli) metryki zbierane są lokalnie i zwracane do procesu głównego.
+    """
+    global _active_metrics
+    previous_metrics = _active_metrics
+    if collect_metrics:
+        _active_metrics = _new_metrics()
+    batch_metrics = _active_metrics if collect_metrics else None
+    try:
+        outcomes = {}
+        for filename, old_path, new_path in file_pairs:
+            with _timed_phase('compare'):
+                result, error = _compare_file_pair(old_path, new_path, include_elements, exclude_elements, include_types, exclude_types, cache_dir)
+            outcomes[filename] = (old_path, new_path, result, error)
+    finally:
+        _active_metrics = previous_metrics
+    return outcomes, batch_metrics
+
+def _compare_file_pair(old_path, new_path, include_elements=None, exclude_elements=None, include_types=None, exclude_types=None, cache_dir=None):
+    """Porównuje jedną parę plików; zwraca (wynik, None) lub (None, opis błędu) - także z procesu puli."""
+    try:
+        return compare_files(old_path, new_path, include_elements, exclude_elements, include_types, exclude_types, cache_dir), None
+    except Exception as e:
+        return None, str(e)
+
+def compare_files(old_file_path, new_file_path, include_elements=None, exclude_elements=None, include_types=None, exclude_types=None, cache_dir=None):
+    old_elements = parse_lookml_file(old_file_path, cache_dir)
+    new_elements = parse_lookml_file(new_file_path, cache_dir)
+    return old_elements, new_elements, _diff_parsed_elements(old_elements, new_elements, include_elements, exclude_elements, include_types, exclude_types)
+
+def _diff_parsed_elements(old_elements, new_elements, include_elements=None, exclude_elements=None, include_types=None, exclude_types=None):
+    """
+    Porównuje sparsowane pliki od góry drzewa skrótów: równe skróty plików lub rodzajów elementów
+    oznaczają brak zmian (poza kosmetycznymi) bez zaglądania do poszczególnych elementów.
+    """
     all_changes = {}
-    element_types_to_compare = ['dimensions', 'measures', 'dimension_groups', 'sets', 'drills', 'filters', 'parameters']
+    if old_elements.digest == new_elements.digest:
+        _add_counter('files_equal_by_digest')
+        return all_changes
+    element_types_to_compare = list(ELEMENT_TYPES.values())
 
     if include_types:
         element_types_to_compare = [t for t in element_types_to_compare if t in include_types or t[:-1] in include_types]
     if exclude_types:
         element_types_to_compare = [t for t in element_types_to_compare if t not in exclude_types and t[:-1] not in exclude_types]
 
-    for element_type in element_types_to_compare:
-        changes = compare_elements(old_elements, new_elements, element_type, include_elements, exclude_elements)
-        if any(changes.values()):
-            all_changes[element_type] = changes
-    return old_elements, new_elements, all_changes
+    with _timed_phase('diff'):
+        for element_type in element_types_to_compare:
+            if old_elements.kind_digest(element_type) == new_elements.kind_digest(element_type):
+                _add_counter('kinds_equal_by_digest')
+                continue
+            changes = compare_elements(old_elements, new_elements, element_type, include_elements, exclude_elements)
+            if any(changes.values()):
+                all_changes[element_type] = changes
+    return all_changes
 
 def compare_elements(old_elements, new_elements, element_type, include_elements=None, exclude_elements=None):
     changes = {'dodane': {}, 'usuniete': {}, 'zmienione': {}}
@@ -145,363 +931,1629 @@ def compare_elements(old_elements, new_elements, element_type, include_elements=
     for name in old_names - new_names:
         changes['usuniete'][name] = old_elements[element_type][name]
     for name in old_names & new_names:
-        old_props = old_elements[element_type][name]['properties']
-        new_props = new_elements[element_type][name]['properties']
-        if old_props != new_props:
-            changes['zmienione'][name] = {'stare': old_elements[element_type][name], 'nowe': new_elements[element_type][name]}
+        # Skróty znormalizowanej treści - różnice kosmetyczne (białe znaki, cudzysłowy, kolejność list) nie są zmianą;
+        # przeniesienie elementu do innego widoku tego samego pliku już tak
+        old_element, new_element = old_elements[element_type][name], new_elements[element_type][name]
+        if old_element.digest != new_element.digest or old_element.parent != new_element.parent:
+            changes['zmienione'][name] = {'stare': old_element, 'nowe': new_element}
     return changes
 
-def setup_merge_directory(merge_folder_path, source_folder_path):
-    merge_path, source_path = Path(merge_folder_path), Path(source_folder_path)
-    if merge_path.exists():
-        shutil.rmtree(merge_path)
-    shutil.copytree(source_path, merge_path)
-    print(f"Skopiowano pliki z {source_path} do {merge_path}")
+# --- Macierz porównań: jeden folder bazowy i wiele folderów docelowych ---
 
-def apply_change_to_file(target_file_path, change_type, element_name, old_element_data, new_element_data, original_old_path=None, original_new_path=None):
-    """Aplikuje pojedynczą, zaakceptowaną przez użytkownika zmianę do pliku w folderze 'merge'."""
+class _SharedParses:
+    """Wyniki parsowania współdzielone przez wiele folderów: pliki o identycznej treści parsowane są raz."""
+    def __init__(self, cache_dir=None):
+        self.cache_dir = cache_dir
+        self.digests = {}  # ścieżka -> skrót treści
+        self.by_digest = {}  # skrót treści -> sparsowane elementy
+
+    def digest(self, path):
+        digest = self.digests.get(path)
+        if digest is None:
+            digest = self.digests[path] = _file_digest(path)
+        return digest
+
+    def parse(self, path):
+        digest = self.digest(path)
+        elements = self.by_digest.get(digest)
+        if elements is None:
+            elements = self.by_digest[digest] = parse_lookml_file(path, self.cache_dir)
+        else:
+            _add_counter('matrix_parses_shared')
+        return elements
+
+def _matrix_targets(target_folders):
+    """
+    {etykieta: folder}; dla listy folderów etykietą jest nazwa folderu (lub pełna ścieżka, gdy nazwy się powtarzają).
+    Ten sam folder podany na liście więcej niż raz jest błędem.
+    """
+    if isinstance(target_folders, dict):
+        return dict(target_folders)
+    resolved = [Path(folder).resolve() for folder in target_folders]
+    duplicates = sorted({str(folder) for folder in resolved if resolved.count(folder) > 1})
+    if duplicates:
+        raise ValueError(f"Foldery docelowe podane więcej niż raz: {duplicates}.")
+    names = [Path(folder).name for folder in target_folders]
+    return {name if names.count(name) == 1 else str(folder): folder for name, folder in zip(names, target_folders)}
+
+def compare_lookml_matrix(baseline_folder, target_folders, include_elements=None, exclude_elements=None, include_types=None, exclude_types=None, cache_dir=None, clear_cache=False, cache_max_bytes=DEFAULT_CACHE_MAX_BYTES, include_files=None, exclude_files=None):
+    """
+    Porównuje jeden folder bazowy z wieloma folderami docelowymi (lista lub {etykieta: folder}).
+    Każdy plik o danej treści czytany i parsowany jest tylko raz dla wszystkich par - plik bazowy raz
+    dla wszystkich celów, a identyczne wersje pliku w kilku celach wspólnie; pliki identyczne z bazowym
+    pomijane są bez parsowania. Zwraca {etykieta: (comparison_results, missing_in_new, missing_in_old)}
+    w kolejności celów, w tej samej postaci co compare_lookml_folders.
+    """
+    if cache_dir is not None and clear_cache:
+        clear_parse_cache(cache_dir)
+    shared = _SharedParses(cache_dir)
+    with _timed_phase('discovery'):
+        baseline_files = get_lookml_files(baseline_folder, include_files, exclude_files)
+    matrix = {}
+    for label, target_folder in _matrix_targets(target_folders).items():
+        with _timed_phase('discovery'):
+            target_files = get_lookml_files(target_folder, include_files, exclude_files)
+        comparison_results = ComparisonResults()
+        for filename in sorted(baseline_files.keys() & target_files.keys()):
+            old_path, new_path = baseline_files[filename], target_files[filename]
+            try:
+                with _timed_phase('identical_check'):
+                    identical = (os.path.getsize(old_path) == os.path.getsize(new_path) and
+                                 shared.digest(old_path) == shared.digest(new_path))
+                if identical:
+                    _add_counter('identical_files_skipped')
+                    continue
+                with _timed_phase('compare'):
+                    old_elements, new_elements = shared.parse(old_path), shared.parse(new_path)
+                    changes = _diff_parsed_elements(old_elements, new_elements, include_elements, exclude_elements, include_types, exclude_types)
+            except Exception as e:
+                print(f"Błąd podczas porównywania pliku {filename} ({label}): {e}")
+                continue
+            _add_counter('files_compared')
+            if changes:
+                comparison_results[filename] = _comparison_result(changes, old_elements, new_elements, old_path, new_path)
+        matrix[label] = (comparison_results, set(baseline_files) - set(target_files), set(target_files) - set(baseline_files))
+
+    if cache_dir is not None:
+        prune_parse_cache(cache_dir, cache_max_bytes)
+    return matrix
+
+def matrix_element_differences(matrix):
+    """
+    Zbiorczy widok macierzy: {(plik, element, rodzaj): {etykieta: [typy zmian]}} - w których celach
+    element (lub cały plik) różni się od wersji bazowej i jak (typy bez powtórzeń, w kolejności wystąpienia).
+    Klucze są posortowane; przeniesienia liczą się w pliku, w którym element znajduje się w wersji docelowej.
+    """
+    differences = defaultdict(dict)
+    for label, (comparison_results, missing_in_new, missing_in_old) in matrix.items():
+        for record in iter_change_records(comparison_results, missing_in_new, missing_in_old):
+            change_types = differences[(record.filename, record.element_name, record.element_type)].setdefault(label, [])
+            if record.change_type not in change_types:
+                change_types.append(record.change_type)
+    return dict(sorted(differences.items()))
+
+def _matrix_cell(cell, label):
+    return '/'.join(cell[label]) if label in cell else '-'
+
+# --- Porównanie dwóch rewizji repozytorium git (bez checkout) ---
+
+class GitBlobSource:
+    """Źródło tekstu elementów sparsowanych z obiektu git - blob czytany ponownie dopiero na żądanie."""
+    __slots__ = ('repo', 'blob')
+
+    def __init__(self, repo, blob):
+        self.repo = repo
+        self.blob = blob
+
+    def read(self, start, end):
+        return _git_blob_text(self.repo, self.blob)[start:end]
+
+@lru_cache(maxsize=8)
+def _git_blob_text(repo, blob):
+    result = subprocess.run(['git', '-C', repo, 'cat-file', 'blob', blob], capture_output=True, check=True)
+    return _decode_lookml(result.stdout)
+
+class _GitBlobReader:
+    """Jeden długo działający proces `git cat-file --batch`, przez który bloby czytane są kolejno, bez plików tymczasowych."""
+
+    def __init__(self, repo):
+        self.process = subprocess.Popen(['git', '-C', repo, 'cat-file', '--batch'],
+                                        stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+
+    def read(self, blob):
+        self.process.stdin.write(blob.encode('ascii') + b'\n')
+        self.process.stdin.flush()
+        header = self.process.stdout.readline().split()
+        if len(header) != 3 or header[1] != b'blob':
+            raise OSError(f"Nie można odczytać obiektu git {blob}: {b' '.join(header).decode('utf-8', 'replace')}")
+        data = self.process.stdout.read(int(header[2]))
+        self.process.stdout.read(1)  # Znak nowej linii kończący obiekt
+        return data
+
+    def close(self):
+        self.process.stdin.close()
+        self.process.stdout.close()
+        self.process.wait()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+def _git_changed_files(repo, old_ref, new_ref):
+    """
+    Zwraca strumieniowo (ścieżka, blob_old lub None, blob_new lub None) dla plików zmienionych między rewizjami
+    (`git diff-tree`, bez wykrywania przemianowań). Pliki niebędące zwykłymi plikami (dowiązania, submoduły) są pomijane.
+    """
+    output = subprocess.run(['git', '-C', repo, 'diff-tree', '-r', '-z', '--no-renames', old_ref, new_ref],
+                            capture_output=True, check=True).stdout
+    fields = output.split(b'\0')
+    for position in range(0, len(fields) - 1, 2):
+        old_mode, new_mode, old_blob, new_blob, _ = fields[position].lstrip(b':').decode('ascii').split()
+        path = fields[position + 1].decode('utf-8', 'surrogateescape')
+        yield (path, old_blob if old_mode.startswith('100') else None, new_blob if new_mode.startswith('100') else None)
+
+def _parse_git_blob(reader, repo, blob, cache_dir):
+    with _timed_phase('git_read'):
+        data = reader.read(blob)
+    _add_counter('git_bytes_read', len(data))
+    source = GitBlobSource(repo, blob)
+    with _timed_phase('parse'):
+        if cache_dir is None:
+            return _parse_lookml_bytes(data, source)
+        return _parse_lookml_bytes_cached(data, Path(cache_dir), source)
+
+def compare_git_revisions(repo_path, old_ref, new_ref, include_elements=None, exclude_elements=None, include_types=None, exclude_types=None, cache_dir=None, cache_max_bytes=DEFAULT_CACHE_MAX_BYTES, include_files=None, exclude_files=None):
+    """
+    Porównuje pliki LookML dwóch rewizji (gałęzi, tagów, commitów) lokalnego repozytorium bez checkout.
+    Lista zmienionych plików pochodzi z różnicy drzew, a treść tylko tych plików czytana jest strumieniowo
+    przez jeden proces `git cat-file --batch` - pliki niezmienione nie są w ogóle odczytywane.
+    Zwraca to samo co compare_lookml_folders; ścieżki plików mają postać 'rewizja:ścieżka'.
+    """
+    include_files = DEFAULT_INCLUDE_FILES if include_files is None else tuple(include_files)
+    exclude_files = DEFAULT_EXCLUDE_FILES if exclude_files is None else tuple(exclude_files)
+    repo = os.path.abspath(repo_path)
     try:
-        if change_type == 'plik_usuniete': # Cały plik usunięty (przywracamy)
-            shutil.copy(original_old_path, target_file_path)
-            print(f"  -> ZASTOSOWANO: Przywrócono plik {element_name} z wersji 'old'.")
+        with _timed_phase('discovery'):
+            changed_files = sorted(entry for entry in _git_changed_files(repo, old_ref, new_ref)
+                                   if _is_lookml_path(entry[0], include_files, exclude_files))
+    except (OSError, subprocess.CalledProcessError) as e:
+        details = e.stderr.decode('utf-8', 'replace').strip() if getattr(e, 'stderr', None) else e
+        print(f"Błąd: Nie można porównać rewizji {old_ref} i {new_ref} w repozytorium {repo_path}: {details}")
+        return ComparisonResults(), set(), set()
+
+    comparison_results, missing_in_new, missing_in_old = ComparisonResults(), set(), set()
+    with _GitBlobReader(repo) as reader:
+        for filename, old_blob, new_blob in changed_files:
+            if new_blob is None:
+                if old_blob is not None:
+                    missing_in_new.add(filename)
+                continue
+            if old_blob is None:
+                missing_in_old.add(filename)
+                continue
+            try:
+                old_elements = _parse_git_blob(reader, repo, old_blob, cache_dir)
+                new_elements = _parse_git_blob(reader, repo, new_blob, cache_dir)
+            except Exception as e:
+                print(f"Błąd podczas porównywania pliku {filename}: {e}")
+                continue
+            _add_counter('files_compared')
+            changes = _diff_parsed_elements(old_elements, new_elements, include_elements, exclude_elements, include_types, exclude_types)
+            if changes:
+                comparison_results[filename] = _comparison_result(changes, old_elements, new_elements, f"{old_ref}:{filename}", f"{new_ref}:{filename}")
+
+    if cache_dir is not None:
+        prune_parse_cache(cache_dir, cache_max_bytes)
+    return comparison_results, missing_in_new, missing_in_old
+
+# --- Folder roboczy łączenia (kopia, dowiązania twarde lub nakładka; tryb próbny w pamięci) ---
+
+MERGE_MODES = ('copy', 'link', 'overlay')
+OVERLAY_MANIFEST_NAME = '.lookml_merge_overlay.json'
+
+def _link_or_copy(source, destination):
+    """Dowiązanie twarde zamiast kopii; kopia, gdy system plików go nie obsługuje (np. inny wolumin)."""
+    try:
+        os.link(source, destination)
+    except OSError:
+        shutil.copy2(source, destination)
+
+class MergeWorkspace:
+    """
+    Folder 'merge' budowany na bazie folderu źródłowego ('new'). Tryby:
+    'copy' (domyślny) - pełna kopia; 'link' - dowiązania twarde: zapisy łączenia są atomowe, więc zastępują
+    dowiązanie nowym plikiem, ale każda późniejsza edycja pliku w miejscu zmienia też plik źródłowy (tryb tylko
+    na żądanie); 'overlay' - materializowane są tylko pliki ze zmianami, a pozostałe opisuje manifest
+    nakładki (patrz materialize_merge_overlay). Przy `dry_run` nic nie jest zapisywane na dysku - wynikowe treści
+    trafiają do `contents` ({plik: treść lub None dla pliku usuniętego}).
+    Bez `source_folder` pracuje bezpośrednio na istniejącym folderze 'merge'.
+    """
+
+    def __init__(self, merge_folder, source_folder=None, mode='copy', dry_run=False):
+        if mode not in MERGE_MODES:
+            raise ValueError(f"Nieznany tryb folderu łączenia {mode!r}; dostępne: {MERGE_MODES}.")
+        self.merge_folder = Path(merge_folder)
+        self.source_folder = Path(source_folder) if source_folder is not None else None
+        self.mode = mode
+        self.dry_run = dry_run
+        self.contents = {}
+        self.materialized = set()
+        self.deleted = set()
+
+    def setup(self):
+        if self.dry_run or self.source_folder is None:
             return
-        elif change_type == 'plik_dodane': # Cały plik dodany (usuwamy)
-            os.remove(target_file_path)
-            print(f"  -> ZASTOSOWANO: Usunięto plik {element_name} z wersji 'new'.")
+        with _timed_phase('merge_setup'):
+            if self.merge_folder.exists():
+                shutil.rmtree(self.merge_folder)
+            if self.mode == 'overlay':
+                self.merge_folder.mkdir(parents=True)
+            else:
+                shutil.copytree(self.source_folder, self.merge_folder,
+                                copy_function=_link_or_copy if self.mode == 'link' else shutil.copy2)
+        action = {'copy': "Skopiowano pliki", 'link': "Utworzono dowiązania plików", 'overlay': "Utworzono nakładkę na pliki"}[self.mode]
+        print(f"{action} z {self.source_folder} do {self.merge_folder}")
+        if self.mode == 'link':
+            _warn_hardlinks(self.source_folder, self.merge_folder)
+
+    def path(self, filename):
+        return self.merge_folder / filename
+
+    def _read_path(self, filename):
+        if self.source_folder is not None and filename not in self.materialized and (self.dry_run or self.mode == 'overlay'):
+            return self.source_folder / filename
+        return self.path(filename)
+
+    def read(self, filename):
+        if filename in self.contents:
+            if self.contents[filename] is None:
+                raise FileNotFoundError(f"Plik {filename} został usunięty w trakcie łączenia.")
+            return self.contents[filename]
+        if filename in self.deleted:
+            raise FileNotFoundError(f"Plik {filename} został usunięty w trakcie łączenia.")
+        with open(self._read_path(filename), 'r', encoding='utf-8') as f:
+            return f.read()
+
+    def write(self, filename, content):
+        if self.dry_run:
+            self.contents[filename] = content
             return
+        path = self.path(filename)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        _write_file_atomically(path, content)
+        self.materialized.add(filename)
+        self.deleted.discard(filename)
 
-        with open(target_file_path, 'r', encoding='utf-8') as f:
-            content = f.read()
-
-        if change_type == 'zmienione_typ': # Zmiana typu elementu
-            content = content.replace(new_element_data['raw_block'], old_element_data['raw_block'])
-            print(f"  -> ZASTOSOWANO: Przywrócono '{element_name}' z wersji 'old' (zmiana typu).")
-        elif change_type == 'dodane':
-            content = content.replace(new_element_data['raw_block'], '')
-            print(f"  -> ZASTOSOWANO: Usunięto dodany element '{element_name}'.")
-        elif change_type == 'usuniete':
-            content += f"\n\n{old_element_data['raw_block']}"
-            print(f"  -> ZASTOSOWANO: Przywrócono usunięty element '{element_name}'.")
-        elif change_type == 'zmienione_atrybut':
-            singular_et = new_element_data['element_type'][:-1] 
-            attribute = new_element_data['attribute']
-            old_value = old_element_data 
-            new_value = new_element_data['value'] 
-
-            element_pattern = re.compile(f"({singular_et}:\s*{element_name}\s*\{{[\s\S]*?\}})", re.DOTALL)
-            match = element_pattern.search(content)
-            if not match:
-                print(f"  -> BŁĄD: Nie znaleziono bloku dla '{element_name}'.")
-                return
+    def restore(self, filename, source_path):
+        """Przywraca cały plik (np. z wersji 'old')."""
+        if self.dry_run:
+            with open(source_path, 'r', encoding='utf-8') as f:
+                self.contents[filename] = f.read()
+            return
+        path = self.path(filename)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copy(source_path, path)
+        self.materialized.add(filename)
+        self.deleted.discard(filename)
 
-            element_block = match.group(1)
-            patterns = {
-                'default': (re.compile(f'({attribute}:\s*)"[^"]*"(\s*)'), f'\g<1>"{old_value}"\g<2>'),
-                'unquoted': (re.compile(f'({attribute}:\s*)[^\n\r]+(\s*)'), f'\g<1>{old_value}\g<2>'),
-                'list': (re.compile(f'({attribute}:\s*\[)[^\]]*(\])'), f'\g<1>{old_value}\g<2>')
-            }
-            
-            if attribute in ['label', 'description', 'value_format', 'url']:
-                pattern, replacement = patterns['default']
-            elif attribute in ['timeframes', 'drill_fields', 'fields']:
-                pattern, replacement = patterns['list']
-            else:
-                pattern, replacement = patterns['unquoted']
+    def remove(self, filename):
+        if self.dry_run:
+            self.contents[filename] = None
+            return
+        if self.mode != 'overlay' or filename in self.materialized:
+            os.remove(self.path(filename))
+        self.materialized.discard(filename)
+        if self.mode == 'overlay':
+            self.deleted.add(filename)
 
-            new_element_block, count = pattern.subn(replacement, element_block)
-            if count == 0:
-                print(f"  -> BŁĄD: Nie udało się podmienić atrybutu '{attribute}' w '{element_name}'.")
-                return
+    def finish(self):
+        """Zapisuje manifest nakładki (tryb 'overlay') albo podsumowanie trybu próbnego."""
+        if self.dry_run:
+            print(f"Tryb próbny: przygotowano {len(self.contents)} plików, niczego nie zapisano.")
+        elif self.mode == 'overlay' and self.source_folder is not None:
+            manifest = {'version': 1, 'source': str(self.source_folder.resolve()),
+                        'materialized': sorted(self.materialized), 'deleted': sorted(self.deleted)}
+            with open(self.merge_folder / OVERLAY_MANIFEST_NAME, 'w', encoding='utf-8') as f:
+                json.dump(manifest, f, ensure_ascii=False, indent=2)
+            print(f"Zapisano manifest nakładki: {self.merge_folder / OVERLAY_MANIFEST_NAME}")
 
-            content = content.replace(element_block, new_element_block)
-            print(f"  -> ZASTOSOWANO: Zmieniono '{attribute}' w '{element_name}'.")
+def _warn_hardlinks(source_folder, merge_folder):
+    print(f"⚠️ Uwaga: niezmienione pliki w {merge_folder} są dowiązaniami twardymi do {source_folder} - "
+          f"edycja ich w miejscu zmieni także pliki źródłowe. Użyj trybu 'copy', jeśli folder będzie edytowany.")
 
-        with open(target_file_path, 'w', encoding='utf-8') as f:
+def materialize_merge_overlay(merge_folder, mode='copy'):
+    """Uzupełnia folder 'merge' w trybie nakładki o niezmienione pliki źródła (dowiązania lub kopie) i usuwa manifest."""
+    merge_folder = Path(merge_folder)
+    manifest_file = merge_folder / OVERLAY_MANIFEST_NAME
+    with open(manifest_file, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    source_folder = Path(manifest['source'])
+    skipped = set(manifest['materialized']) | set(manifest['deleted'])
+    copy_function = _link_or_copy if mode == 'link' else shutil.copy2
+    for directory, _, files in os.walk(source_folder):
+        for name in files:
+            source_path = Path(directory) / name
+            rel_path = source_path.relative_to(source_folder).as_posix()
+            if rel_path not in skipped:
+                (merge_folder / rel_path).parent.mkdir(parents=True, exist_ok=True)
+                copy_function(source_path, merge_folder / rel_path)
+    manifest_file.unlink()
+    print(f"Zmaterializowano nakładkę {merge_folder} z {source_folder}")
+    if mode == 'link':
+        _warn_hardlinks(source_folder, merge_folder)
+
+def setup_merge_directory(merge_folder_path, source_folder_path, mode='copy', dry_run=False):
+    """Przygotowuje folder 'merge' (patrz MergeWorkspace) i zwraca go jako obiekt, przez który zapisywane są zmiany."""
+    workspace = MergeWorkspace(merge_folder_path, source_folder_path, mode, dry_run)
+    workspace.setup()
+    return workspace
+
+# --- Silnik łączenia: zbiorcze, oparte na pozycjach z parsera i atomowe zapisy ---
+
+def _line_extended_span(content, start, end):
+    """Rozszerza zakres do pełnych linii, jeśli poza nim w tych liniach są tylko białe znaki."""
+    line_start, line_end = start, end
+    while line_start > 0 and content[line_start - 1] in ' \t':
+        line_start -= 1
+    while line_end < len(content) and content[line_end] in ' \t':
+        line_end += 1
+    if (line_start == 0 or content[line_start - 1] == '\n') and (line_end == len(content) or content[line_end] == '\n'):
+        return line_start, min(line_end + 1, len(content))
+    return start, end
+
+def _insertion_before_closing_brace(content, close_pos, text, separate=False):
+    """
+    Zwraca (pozycja, tekst) wstawienia `text` jako ostatniej linii bloku zamykanego klamrą na `close_pos`.
+    Przy `separate` wstawiany blok oddzielany jest pustą linią.
+    """
+    separator = "\n" if separate else ""
+    line_start = content.rfind('\n', 0, close_pos) + 1
+    closing_indent = content[line_start:close_pos]
+    if closing_indent.strip():
+        if separate or '\n' in text:
+            return close_pos, f"\n{separator}  {text}\n"
+        padding = '' if content[close_pos - 1] in ' \t' else ' '
+        return close_pos, f"{padding}{text} "  # Blok jednoliniowy
+    return line_start, f"{separator}{closing_indent}  {text}\n"
+
+def _write_file_atomically(target_file_path, content):
+    target_file_path = Path(target_file_path)
+    tmp_file = target_file_path.with_name(f".{target_file_path.name}.{os.getpid()}.tmp")
+    try:
+        with open(tmp_file, 'w', encoding='utf-8') as f:
             f.write(content)
+        if target_file_path.exists():
+            shutil.copymode(target_file_path, tmp_file)
+        os.replace(tmp_file, target_file_path)
+    finally:
+        if tmp_file.exists():
+            tmp_file.unlink()
+
+def _scan_target(target):
+    """Leniwy indeks elementów i bloków pliku docelowego - plik skanowany jest co najwyżej raz."""
+    if target['elements'] is None:
+        target['blocks'] = {}
+        target['elements'] = _scan_lookml(target['content'], _empty_elements(), blocks=target['blocks'])
+
+def _locate_element(target, element, element_type, name):
+    """Zwraca element z aktualnymi pozycjami: zapisane przy parsowaniu, jeśli nadal pasują, inaczej z ponownego skanu."""
+    span = element.span if element else None
+    if span and target['content'][span[0]:span[1]] == element.raw_block:
+        return element
+    _scan_target(target)
+    if name in target['elements'].get(element_type, {}):
+        return target['elements'][element_type][name]
+    return next((elements[name] for elements in target['elements'].values() if name in elements), None)
+
+def _locate_block(target, key, name):
+    _scan_target(target)
+    return target['blocks'].get((key, name))
+
+def _change_kind(change, element):
+    """Rodzaj elementu zmiany; bez elementu (wywołania apply_change_to_file) ustalany z `element_type`."""
+    if element is not None and element.kind is not None:
+        return element.kind
+    return ELEMENT_TYPES.get(change.element_type)
+
+def _plan_change(target, change):
+    """Zamienia jedną decyzję (ChangeRecord) na listę edycji (początek, koniec, tekst) oraz komunikat."""
+    content = target['content']
+    action_type = change.action_type
+    element_name = change.element_name
+    old_element, new_element = change.old_element, change.new_element
+    kind = _change_kind(change, new_element)
 
+    if action_type == 'zmienione_typ': # Zmiana typu elementu
+        located = _locate_element(target, new_element, kind, element_name)
+        if located is None:
+            return None, f"Nie znaleziono bloku dla '{element_name}'."
+        start, end = located.span
+        return [(start, end, old_element.raw_block)], f"Przywrócono '{element_name}' z wersji 'old' (zmiana typu)."
+
+    if action_type == 'przeniesione': # Zmiana nazwy lub przeniesienie w obrębie pliku - podmiana bloku w miejscu
+        located = _locate_element(target, new_element, kind, element_name)
+        if located is None:
+            return None, f"Nie znaleziono bloku dla '{element_name}'."
+        start, end = located.span
+        return [(start, end, old_element.raw_block)], f"Przywrócono '{old_element.name}' w miejsce '{element_name}'."
+
+    if action_type == 'dodane':
+        located = _locate_element(target, new_element, kind, element_name)
+        if located is None:
+            return None, f"Nie znaleziono bloku dla '{element_name}'."
+        start, end = _line_extended_span(content, *located.span)
+        return [(start, end, '')], f"Usunięto dodany element '{element_name}'."
+
+    if action_type == 'usuniete':
+        parent_block = _locate_block(target, 'view', old_element.parent) if old_element.parent else None
+        if parent_block:
+            position, text = _insertion_before_closing_brace(content, parent_block[1] - 1, old_element.raw_block, separate=True)
+        else:
+            position, text = len(content), f"\n\n{old_element.raw_block}"
+        return [(position, position, text)], f"Przywrócono usunięty element '{element_name}'."
+
+    if action_type == 'zmienione_atrybut':
+        attribute = change.attribute
+        located = _locate_element(target, new_element, kind, element_name)
+        if located is None:
+            return None, f"Nie znaleziono bloku dla '{element_name}'."
+        new_spans = located.property_spans or {}
+        if change.old_value == '[BRAK]':  # Atrybut dodany w 'new' - usuwamy całą właściwość
+            if attribute not in new_spans:
+                return None, f"Nie udało się podmienić atrybutu '{attribute}' w '{element_name}'."
+            start, _, _, end = new_spans[attribute]
+            start, end = _line_extended_span(content, start, end)
+            return [(start, end, '')], f"Usunięto '{attribute}' z '{element_name}'."
+        if attribute in new_spans:
+            _, value_start, value_end, _ = new_spans[attribute]
+            return [(value_start, value_end, change.old_value)], f"Zmieniono '{attribute}' w '{element_name}'."
+        # Atrybut usunięty w 'new' - przywracamy całą właściwość z wersji 'old'
+        old_spans = (old_element.property_spans or {}) if old_element else {}
+        if attribute in old_spans:
+            start, _, _, end = old_spans[attribute]
+            statement = old_element.source.read(start, end)
+        else:
+            statement = f"{_base_property(attribute)}: {change.old_value}"
+        position, text = _insertion_before_closing_brace(content, located.span[1] - 1, statement)
+        return [(position, position, text)], f"Przywrócono '{attribute}' w '{element_name}'."
+
+    return None, f"Nieznany rodzaj zmiany '{action_type}' dla '{element_name}'."
+
+def apply_changes_to_file(target_file_path, changes, workspace=None):
+    """
+    Aplikuje wszystkie zaakceptowane zmiany jednego pliku w jednym przebiegu.
+    Edycje lokalizowane są po pozycjach zapisanych przez parser (z ponownym skanem pliku, gdy się nie zgadzają),
+    nakładane od początku do końca pliku, a wynik zapisywany raz - atomowo (plik tymczasowy + rename).
+    Z `workspace` (MergeWorkspace) `target_file_path` jest ścieżką względną pliku w folderze 'merge'.
+    """
+    if workspace is None:
+        target_file_path = Path(target_file_path)
+        workspace, target_file_path = MergeWorkspace(target_file_path.parent), target_file_path.name
+    with _timed_phase('merge_write'):
+        _apply_changes_to_file(workspace, Path(target_file_path).as_posix(), changes)
+
+def _apply_changes_to_file(workspace, filename, changes):
+    file_changes = [c for c in changes if c.action_type in ('plik_usuniete', 'plik_dodane')]
+    element_changes = [c for c in changes if c.action_type not in ('plik_usuniete', 'plik_dodane')]
+    try:
+        for change in file_changes:
+            if change.action_type == 'plik_usuniete': # Cały plik usunięty (przywracamy)
+                workspace.restore(filename, change.original_old_path)
+                print(f"  -> ZASTOSOWANO: Przywrócono plik {change.element_name} z wersji 'old'.")
+            else: # Cały plik dodany (usuwamy)
+                workspace.remove(filename)
+                print(f"  -> ZASTOSOWANO: Usunięto plik {change.element_name} z wersji 'new'.")
+        if not element_changes:
+            return
+
+        content = workspace.read(filename)
+        target = {'content': content, 'elements': None, 'blocks': None}
+
+        edits = []
+        for sequence, change in enumerate(element_changes):
+            planned, message = _plan_change(target, change)
+            if planned is None:
+                print(f"  -> BŁĄD: {message}")
+                continue
+            for start, end, text in planned:
+                edits.append((start, end, sequence, text, message))
+
+        pieces, cursor, messages = [], 0, []
+        for start, end, _, text, message in sorted(edits, key=lambda e: (e[0], e[2])):
+            if start < cursor:
+                print(f"  -> BŁĄD: Zmiana nakłada się na wcześniej zastosowaną edycję ({message})")
+                continue
+            pieces.append(content[cursor:start])
+            pieces.append(text)
+            cursor = end
+            messages.append(message)
+        pieces.append(content[cursor:])
+
+        if messages:
+            merged_content = ''.join(pieces)
+            workspace.write(filename, merged_content)
+            _add_counter('merge_files_written')
+            _add_counter('merge_bytes_written', len(merged_content.encode('utf-8')))
+        for message in messages:
+            print(f"  -> ZASTOSOWANO: {message}")
     except Exception as e:
-        print(f"  -> BŁĄD podczas zapisu zmiany dla '{element_name}': {e}")
+        print(f"  -> BŁĄD podczas zapisu zmian w pliku '{workspace.path(filename)}': {e}")
 
-def _get_all_changes_as_list(comparison_results, missing_in_new, missing_in_old):
-    all_changes_list = []
-    
+def _legacy_element(data, name):
+    """Element z dawnego słownika {'raw_block': ..., 'parent': ...}; LookMLElement i None przechodzą bez zmian."""
+    if not isinstance(data, dict):
+        return data
+    raw_block = data['raw_block']
+    return LookMLElement(data.get('kind'), name, data.get('properties', {}), _TextSource(raw_block),
+                         (0, len(raw_block)), data.get('property_spans'), data.get('parent'))
+
+def apply_change_to_file(target_file_path, change_type, element_name, old_element_data, new_element_data, original_old_path=None, original_new_path=None):
+    """
+    Aplikuje pojedynczą, zaakceptowaną przez użytkownika zmianę do pliku w folderze 'merge'.
+    Przyjmuje zarówno elementy LookMLElement, jak i dawne słowniki z 'raw_block'; element, którego
+    nie podano, odnajdywany jest ponownym skanem pliku docelowego.
+    """
+    if change_type == 'zmienione_atrybut': # Dla atrybutów old_element_data to sama wartość
+        change = ChangeRecord(None, element_name, new_element_data['element_type'][:-1], 'ZMIENIONE', new_element_data['attribute'],
+                              old_element_data, new_element_data['value'], change_type,
+                              old_element=_legacy_element(new_element_data.get('old_element'), element_name),
+                              new_element=_legacy_element(new_element_data.get('element'), element_name))
+    else:
+        change = ChangeRecord(None, element_name, None, None, None, None, None, change_type,
+                              old_element=_legacy_element(old_element_data, element_name),
+                              new_element=_legacy_element(new_element_data, element_name),
+                              original_old_path=original_old_path, original_new_path=original_new_path)
+    apply_changes_to_file(target_file_path, [change])
+
+def apply_merge_decisions(merge_folder, accepted_changes):
+    """
+    Grupuje zaakceptowane zmiany według plików i zapisuje każdy plik w folderze 'merge' dokładnie raz.
+    `merge_folder` to ścieżka istniejącego folderu albo MergeWorkspace (np. z setup_merge_directory).
+    """
+    workspace = merge_folder if isinstance(merge_folder, MergeWorkspace) else MergeWorkspace(merge_folder)
+    # Cofnięcie przeniesienia przywraca cały blok z wersji 'old' - zmiany atrybutów tego elementu są w nim zawarte
+    reverted_moves = {id(change.new_element) for change in accepted_changes if change.action_type == 'przeniesione'}
+    changes_by_file = defaultdict(list)
+    for change in accepted_changes:
+        if change.action_type == 'zmienione_atrybut' and id(change.new_element) in reverted_moves:
+            continue
+        if change.action_type == 'przeniesione' and (change.old_filename != change.filename or
+                                                     change.old_element.parent != change.new_element.parent):
+            # Cofnięcie przeniesienia między plikami lub widokami: usunięcie elementu z nowego miejsca
+            # i przywrócenie go w starym pliku, w jego dawnym widoku
+            changes_by_file[change.filename].append(ChangeRecord(
+                change.filename, change.element_name, change.element_type, 'DODANE', 'cały element', '-', 'istnieje', 'dodane',
+                new_element=change.new_element))
+            changes_by_file[change.old_filename].append(ChangeRecord(
+                change.old_filename, change.old_element.name, change.element_type, 'USUNIĘTE', 'cały element', 'istniał', '-', 'usuniete',
+                old_element=change.old_element))
+            continue
+        changes_by_file[change.filename].append(change)
+    for filename in sorted(changes_by_file):
+        print(f"\n--- Zapisywanie pliku: {filename} ---")
+        apply_changes_to_file(filename, changes_by_file[filename], workspace)
+
+@dataclass(slots=True)
+class ChangeRecord:
+    """Pojedynczy wiersz zmiany, wspólny dla raportów i łączenia."""
+    filename: str
+    element_name: str
+    element_type: str  # Rodzaj w liczbie pojedynczej, 'rodzaj' (zmiana typu) lub 'plik'
+    change_type: str  # DODANE / USUNIĘTE / ZMIENIONE
+    attribute: str
+    old_value: str
+    new_value: str
+    action_type: str  # plik_usuniete / plik_dodane / zmienione_typ / dodane / usuniete / zmienione_atrybut / przeniesione
+    old_element: LookMLElement = None
+    new_element: LookMLElement = None
+    original_old_path: Path = None
+    original_new_path: Path = None
+    old_filename: str = None  # Plik elementu w wersji 'old' (przeniesienia między plikami)
+    impact: tuple = None  # Pola zależne (przechodnio) od zmienionego elementu, gdy podano indeks odwołań
+
+# --- Wykrywanie zmian nazw i przeniesień elementów (odciski treści + MinHash) ---
+
+MOVE_SIMILARITY_THRESHOLD = 0.7  # Minimalne podobieństwo Jaccarda tokenów treści pary usunięty/dodany
+_MOVE_MIN_TOKENS = 3  # Elementy o uboższej treści (np. pusty blok) nie są parowane
+_MINHASH_BANDS = 8
+_MINHASH_ROWS = 4  # 8 pasm po 4 wartości: para o podobieństwie 0.7 trafia do wspólnego kubełka z p. ~0.9
+_MINHASH_MAX_BUCKET = 64  # Większe kubełki (np. wspólne szablony pól) nie niosą informacji i są pomijane
+_MINHASH_MASKS = [random.Random(seed).getrandbits(32) for seed in range(_MINHASH_BANDS * _MINHASH_ROWS)]
+_WORD_RE = re.compile(r'\w+')
+
+def _content_tokens(element):
+    """Zbiór tokenów treści: słowa wartości właściwości poprzedzone nazwą właściwości (bez nazwy elementu)."""
+    return {f"{key}:{word}" for key, value in element.properties.items() for word in _WORD_RE.findall(value.lower())}
+
+def _minhash_signature(tokens):
+    hashes = [zlib.crc32(token.encode('utf-8')) for token in tokens]
+    return [min(h ^ mask for h in hashes) for mask in _MINHASH_MASKS]
+
+def _move_candidates(comparison_results):
+    """Zwraca listy (plik, element, tokeny) elementów usuniętych i dodanych we wspólnych plikach (bez zmian typu)."""
+    removed, added = [], []
+    for filename in sorted(comparison_results):
+        result = comparison_results[filename]
+        old_kinds, new_kinds = result['old_elements_parsed'].kinds, result['new_elements_parsed'].kinds
+        for type_changes in result['changes'].values():
+            for side, candidates in (('usuniete', removed), ('dodane', added)):
+                for name in sorted(type_changes.get(side, {})):
+                    if name in old_kinds and name in new_kinds and old_kinds[name] != new_kinds[name]:
+                        continue  # Zmiana typu elementu - raportowana osobno
+                    element = type_changes[side][name]
+                    tokens = _content_tokens(element)
+                    if len(tokens) >= _MOVE_MIN_TOKENS:
+                        candidates.append((filename, element, tokens))
+    return removed, added
+
+def detect_moved_elements(comparison_results, threshold=MOVE_SIMILARITY_THRESHOLD):
+    """
+    Paruje elementy usunięte z elementami dodanymi (w całym projekcie) o tej samej lub podobnej treści
+    i zwraca listę (plik_old, plik_new, element_old, element_new, podobieństwo).
+    Kandydatami są tylko elementy z plików obecnych w obu folderach - pliki dodane lub usunięte w całości
+    (missing_in_old / missing_in_new) nie są parsowane i raportowane są jako całe pliki, a ich cofnięcie
+    i tak wymaga skopiowania lub usunięcia pliku, więc przeniesienie do takiego pliku nie zostanie wykryte.
+    Przeniesienie do innego widoku tego samego pliku bez zmiany nazwy wykrywa już compare_elements.
+    Najpierw łączone są elementy o identycznej znormalizowanej treści (słownik odcisków), pozostałe
+    przez indeks MinHash/LSH - porównywane są tylko pary ze wspólnego kubełka, więc koszt rośnie
+    prawie liniowo z liczbą elementów zamiast kwadratowo.
+    """
+    with _timed_phase('move_detection'):
+        removed, added = _move_candidates(comparison_results)
+        if not removed or not added:
+            return []
+        moves = []
+        used_removed, used_added = set(), set()
+
+        # Etap 1: identyczna treść (zmiana nazwy lub przeniesienie bez edycji), najpierw w obrębie pliku
+        exact = defaultdict(lambda: ([], []))
+        for index, (_, element, _) in enumerate(removed):
+            exact[(element.kind, element.digest)][0].append(index)
+        for index, (_, element, _) in enumerate(added):
+            key = (element.kind, element.digest)
+            if key in exact:
+                exact[key][1].append(index)
+        for removed_ids, added_ids in exact.values():
+            if not added_ids:
+                continue
+            added_by_file = defaultdict(list)
+            for a in reversed(added_ids):
+                added_by_file[added[a][0]].append(a)
+            leftover_removed = []
+            for r in removed_ids:
+                same_file = added_by_file.get(removed[r][0])
+                if same_file:
+                    moves.append((r, same_file.pop(), 1.0))
+                else:
+                    leftover_removed.append(r)
+            remaining = {a for ids in added_by_file.values() for a in ids}
+            leftover_added = [a for a in added_ids if a in remaining]
+            moves.extend((r, a, 1.0) for r, a in zip(leftover_removed, leftover_added))
+        used_removed.update(r for r, _, _ in moves)
+        used_added.update(a for _, a, _ in moves)
+
+        # Etap 2: podobna treść - kandydaci ze wspólnych kubełków LSH
+        buckets = defaultdict(lambda: ([], []))
+        for side, candidates, used in ((0, removed, used_removed), (1, added, used_added)):
+            for index, (_, element, tokens) in enumerate(candidates):
+                if index in used:
+                    continue
+                signature = _minhash_signature(tokens)
+                for band in range(_MINHASH_BANDS):
+                    rows = tuple(signature[band * _MINHASH_ROWS:(band + 1) * _MINHASH_ROWS])
+                    buckets[(element.kind, band, rows)][side].append(index)
+        scored = {}
+        for removed_ids, added_ids in buckets.values():
+            if not removed_ids or not added_ids or len(removed_ids) > _MINHASH_MAX_BUCKET or len(added_ids) > _MINHASH_MAX_BUCKET:
+                continue
+            for r in removed_ids:
+                for a in added_ids:
+                    if (r, a) not in scored:
+                        old_tokens, new_tokens = removed[r][2], added[a][2]
+                        scored[(r, a)] = len(old_tokens & new_tokens) / len(old_tokens | new_tokens)
+        ranked = sorted(((similarity, removed[r][0] != added[a][0], r, a) for (r, a), similarity in scored.items()
+                         if similarity >= threshold), key=lambda item: (-item[0], item[1], item[2], item[3]))
+        for similarity, _, r, a in ranked:
+            if r not in used_removed and a not in used_added:
+                used_removed.add(r)
+                used_added.add(a)
+                moves.append((r, a, similarity))
+
+        _add_counter('elements_moved', len(moves))
+        return [(removed[r][0], added[a][0], removed[r][1], added[a][1], similarity) for r, a, similarity in moves]
+
+def _element_location(filename, element):
+    return f"{filename}:{element.parent}.{element.name}" if element.parent else f"{filename}:{element.name}"
+
+def _move_record(old_filename, new_filename, old_element, new_element):
+    renamed = old_element.name != new_element.name
+    moved = old_filename != new_filename or old_element.parent != new_element.parent
+    attribute = 'nazwa+położenie' if renamed and moved else ('nazwa' if renamed else 'położenie')
+    old_value = _element_location(old_filename, old_element) if moved else old_element.name
+    new_value = _element_location(new_filename, new_element) if moved else new_element.name
+    return ChangeRecord(new_filename, new_element.name, new_element.kind[:-1], 'PRZENIESIONE', attribute, old_value, new_value,
+                        'przeniesione', old_element=old_element, new_element=new_element, old_filename=old_filename)
+
+# --- Indeks odwołań do pól i analiza wpływu zmian ---
+
+_DEFAULT_TIMEFRAMES = ('raw', 'time', 'date', 'week', 'month', 'quarter', 'year')
+_DEFAULT_INTERVALS = ('day', 'hour', 'minute', 'month', 'quarter', 'second', 'week', 'year')
+
+def _element_key(element):
+    """Klucz pola w indeksie odwołań: 'widok.pole' lub sama nazwa elementu spoza widoku."""
+    return f"{element.parent.lstrip('+')}.{element.name}" if element.parent else element.name
+
+def _generated_fields(element):
+    """Klucze pól tworzonych przez dimension_group (np. orders.created_date), do których odwołują się inne pola."""
+    if element.kind != 'dimension_groups':
+        return ()
+    properties = element.properties
+    if properties.get('type', '').strip() == 'duration':
+        items = _normalize_property('intervals', properties['intervals']).split(', ') if 'intervals' in properties else _DEFAULT_INTERVALS
+        names = [f"{interval}s_{element.name}" for interval in items if interval]
+    else:
+        items = _normalize_property('timeframes', properties['timeframes']).split(', ') if 'timeframes' in properties else _DEFAULT_TIMEFRAMES
+        names = [f"{element.name}_{timeframe}" for timeframe in items if timeframe]
+    return [f"{element.parent.lstrip('+')}.{name}" if element.parent else name for name in names]
+
+class ReferenceIndex:
+    """
+    Odwrócony indeks odwołań między polami całego projektu: dla każdego pola elementy, które się do niego
+    odwołują (z referencji zapisanych przez parser, bez ponownego czytania plików). Budowany przyrostowo,
+    plik po pliku (add_file / remove_file); impact() przechodzi graf wszerz, odwiedzając każdą krawędź raz.
+    """
+    def __init__(self):
+        self.dependents = defaultdict(Counter)  # pole -> {element odwołujący się: liczba odwołań}
+        self.generated = defaultdict(Counter)  # klucz dimension_group -> {pole generowane: liczba definicji}
+        self._file_entries = {}  # plik -> (krawędzie, pola generowane), do wycofania w remove_file
+
+    def add_file(self, filename, elements):
+        self.remove_file(filename)
+        edges, generated = [], []
+        for kind_elements in elements.values():
+            for element in kind_elements.values():
+                key = _element_key(element)
+                edges.extend((reference, key) for reference in element.references if reference != key)
+                generated.extend((key, name) for name in _generated_fields(element))
+        for target, source in edges:
+            self.dependents[target][source] += 1
+        for key, name in generated:
+            self.generated[key][name] += 1
+        self._file_entries[filename] = (edges, generated)
+
+    def remove_file(self, filename):
+        edges, generated = self._file_entries.pop(filename, ((), ()))
+        for mapping, pairs in ((self.dependents, edges), (self.generated, generated)):
+            for outer, inner in pairs:
+                counts = mapping[outer]
+                counts[inner] -= 1
+                if counts[inner] <= 0:
+                    del counts[inner]
+                    if not counts:
+                        del mapping[outer]
+
+    def direct_dependents(self, key):
+        """Elementy odwołujące się wprost do pola `key` lub do pól generowanych przez nie (dimension_group)."""
+        dependents = set(self.dependents.get(key, ()))
+        for name in self.generated.get(key, ()):
+            dependents.update(self.dependents.get(name, ()))
+        return dependents
+
+    def impact(self, key):
+        """Posortowana krotka wszystkich pól zależnych od `key` (przechodnio), bez samego `key`."""
+        seen, pending = {key}, deque([key])
+        while pending:
+            for dependent in self.direct_dependents(pending.popleft()):
+                if dependent not in seen:
+                    seen.add(dependent)
+                    pending.append(dependent)
+        seen.discard(key)
+        return tuple(sorted(seen))
+
+def build_reference_index(folder_path, include_files=None, exclude_files=None, cache_dir=None, parsed=None):
+    """
+    Buduje ReferenceIndex dla wszystkich plików LookML folderu. `parsed` ({plik: elementy}) pozwala użyć
+    wyników parsowania z porównania (np. new_elements_parsed) zamiast parsować te pliki ponownie.
+    """
+    parsed = parsed or {}
+    index = ReferenceIndex()
+    with _timed_phase('reference_index'):
+        for rel_path, path in iter_lookml_files(folder_path, include_files, exclude_files):
+            elements = parsed.get(rel_path)
+            if elements is None:
+                try:
+                    elements = parse_lookml_file(path, cache_dir)
+                except (OSError, UnicodeDecodeError) as e:
+                    print(f"Błąd: Nie można odczytać pliku {path}: {e}")
+                    continue
+            index.add_file(rel_path, elements)
+    _add_counter('reference_edges', sum(len(counts) for counts in index.dependents.values()))
+    return index
+
+def _with_impact(records, reference_index):
+    """Uzupełnia pole `impact` rekordów elementów (wyniki dla klucza liczone raz)."""
+    impacts = {}
+    def impact(element):
+        key = _element_key(element)
+        if key not in impacts:
+            impacts[key] = reference_index.impact(key)
+        return impacts[key]
+    for record in records:
+        if record.element_type != 'plik':
+            keys = set()
+            for element in (record.old_element, record.new_element):
+                if element is not None:
+                    keys.update(impact(element))
+            record.impact = tuple(sorted(keys))
+        yield record
+
+def iter_change_records(comparison_results, missing_in_new, missing_in_old, folder_old="folder_old", folder_new="folder_new", reference_index=None):
+    """
+    Jedyne źródło wierszy zmian (ChangeRecord) dla konsoli, raportu HTML i łączenia.
+    Zwraca rekordy strumieniowo w stałej kolejności: pliki usunięte, pliki dodane, a następnie
+    zmiany w kolejnych plikach (alfabetycznie), uporządkowane według nazwy elementu.
+    Pary usunięty/dodany rozpoznane przez detect_moved_elements zastępowane są rekordem 'przeniesione'
+    w pliku, w którym element znajduje się w wersji 'new', oraz - gdy treść nie jest identyczna - rekordami
+    'zmienione_atrybut' dla każdej właściwości, która się różni.
+    Przy `reference_index` rekordy elementów otrzymują listę pól zależnych (`impact`).
+    """
+    if reference_index is not None:
+        yield from _with_impact(iter_change_records(comparison_results, missing_in_new, missing_in_old, folder_old, folder_new), reference_index)
+        return
     # Dodane/Usunięte pliki
     for filename in sorted(missing_in_new):
-        all_changes_list.append({
-            'filename': filename,
-            'element_name': filename,
-            'element_type': 'plik',
-            'change_type': 'USUNIĘTE',
-            'attribute': 'cały plik',
-            'old_value': 'istniał',
-            'new_value': '-',
-            'raw_old_data': None, # Nie dotyczy
-            'raw_new_data': None, # Nie dotyczy
-            'action_type': 'plik_usuniete',
-            'original_old_path': Path("folder_old") / filename, # Ścieżka do oryginalnego pliku
-            'original_new_path': None
-        })
+        yield ChangeRecord(filename, filename, 'plik', 'USUNIĘTE', 'cały plik', 'istniał', '-', 'plik_usuniete',
+                           original_old_path=Path(folder_old) / filename) # Ścieżka do oryginalnego pliku
     for filename in sorted(missing_in_old):
-        all_changes_list.append({
-            'filename': filename,
-            'element_name': filename,
-            'element_type': 'plik',
-            'change_type': 'DODANE',
-            'attribute': 'cały plik',
-            'old_value': '-',
-            'new_value': 'istnieje',
-            'raw_old_data': None,
-            'raw_new_data': None,
-            'action_type': 'plik_dodane',
-            'original_old_path': None,
-            'original_new_path': Path("folder_new") / filename # Ścieżka do oryginalnego pliku
-        })
-
-    for filename, result in sorted(comparison_results.items()):
-        old_elements_parsed = result['old_elements_parsed']
-        new_elements_parsed = result['new_elements_parsed']
-        changes = result['changes']
-        
-        processed_elements = set() # Zbiór elementów już przetworzonych (np. zmiana typu)
-
-        # Krok 1: Zmiany typu elementu
-        all_element_names = set(k for et in old_elements_parsed.values() for k in et) | set(k for et in new_elements_parsed.values() for k in et)
-        for name in sorted(list(all_element_names)):
-            old_type = next((et for et, elements in old_elements_parsed.items() if name in elements), None)
-            new_type = next((et for et, elements in new_elements_parsed.items() if name in elements), None)
-
-            if old_type and new_type and old_type != new_type:
-                all_changes_list.append({
-                    'filename': filename,
-                    'element_name': name,
-                    'element_type': 'rodzaj',
-                    'change_type': 'ZMIENIONE',
-                    'attribute': 'typ',
-                    'old_value': old_type[:-1],
-                    'new_value': new_type[:-1],
-                    'raw_old_data': old_elements_parsed[old_type][name],
-                    'raw_new_data': new_elements_parsed[new_type][name],
-                    'action_type': 'zmienione_typ'
-                })
-                processed_elements.add(name)
-
-        # Krok 2: Dodane i usunięte elementy (wspólne pliki)
-        for element_type, type_changes in changes.items():
-            singular_et = element_type[:-1]
-            for name, data in type_changes.get('dodane', {}).items():
-                if name in processed_elements: continue
-                all_changes_list.append({
-                    'filename': filename,
-                    'element_name': name,
-                    'element_type': singular_et,
-                    'change_type': 'DODANE',
-                    'attribute': 'cały element',
-                    'old_value': '-',
-                    'new_value': 'istnieje',
-                    'raw_old_data': None,
-                    'raw_new_data': data,
-                    'action_type': 'dodane'
-                })
-                processed_elements.add(name)
-
-            for name, data in type_changes.get('usuniete', {}).items():
-                if name in processed_elements: continue
-                all_changes_list.append({
-                    'filename': filename,
-                    'element_name': name,
-                    'element_type': singular_et,
-                    'change_type': 'USUNIĘTE',
-                    'attribute': 'cały element',
-                    'old_value': 'istniał',
-                    'new_value': '-',
-                    'raw_old_data': data,
-                    'raw_new_data': None,
-                    'action_type': 'usuniete'
-                })
-                processed_elements.add(name)
-
-        # Krok 3: Zmienione atrybuty
-        for element_type, type_changes in changes.items():
-            singular_et = element_type[:-1]
-            for name, data in type_changes.get('zmienione', {}).items():
-                if name in processed_elements: continue
-                old_props = data['stare']['properties']
-                new_props = data['nowe']['properties']
-                all_keys = set(old_props.keys()) | set(new_props.keys())
-                for key in sorted(list(all_keys)):
-                    old_val, new_val = old_props.get(key, '[BRAK]'), new_props.get(key, '[BRAK]')
-                    if old_val != new_val:
-                        all_changes_list.append({
-                            'filename': filename,
-                            'element_name': name,
-                            'element_type': singular_et,
-                            'change_type': 'ZMIENIONE',
-                            'attribute': key,
-                            'old_value': old_val,
-                            'new_value': new_val,
-                            'raw_old_data': old_val, # Dla atrybutów, raw_old_data to sama wartość
-                            'raw_new_data': {'value': new_val, 'element_type': element_type, 'attribute': key},
-                            'action_type': 'zmienione_atrybut'
-                        })
-    return all_changes_list
-
-def interactive_merge_changes(comparison_results, merge_folder, missing_in_new, missing_in_old):
+        yield ChangeRecord(filename, filename, 'plik', 'DODANE', 'cały plik', '-', 'istnieje', 'plik_dodane',
+                           original_new_path=Path(folder_new) / filename)
+
+    moves_by_file, moved_elements = defaultdict(list), set()
+    moves = comparison_results.moves() if isinstance(comparison_results, ComparisonResults) else detect_moved_elements(comparison_results)
+    for old_filename, new_filename, old_element, new_element, _ in moves:
+        moves_by_file[new_filename].append(_move_record(old_filename, new_filename, old_element, new_element))
+        moves_by_file[new_filename].extend(_attribute_change_records(new_filename, old_element, new_element))
+        moved_elements.add(('usuniete', old_filename, old_element.kind, old_element.name))
+        moved_elements.add(('dodane', new_filename, new_element.kind, new_element.name))
+
+    for filename in sorted(comparison_results):
+        # sorted() jest stabilne - w obrębie elementu zachowana zostaje kolejność kroków poniżej
+        file_records = _iter_file_change_records(filename, comparison_results[filename], moved_elements)
+        yield from sorted([*file_records, *moves_by_file.get(filename, ())], key=lambda r: r.element_name)
+
+def _iter_file_change_records(filename, result, moved_elements=frozenset()):
+    old_elements_parsed = result['old_elements_parsed']
+    new_elements_parsed = result['new_elements_parsed']
+    changes = result['changes']
+
+    type_changed_elements = set() # Elementy, których rodzaj się zmienił - pomijane w krokach 2 i 3
+
+    # Krok 1: Zmiany typu elementu - jedno wyszukanie w indeksie nazwa -> rodzaj na element
+    new_kinds = new_elements_parsed.kinds
+    for name, old_type in old_elements_parsed.kinds.items():
+        new_type = new_kinds.get(name)
+        if new_type is not None and new_type != old_type:
+            yield ChangeRecord(filename, name, 'rodzaj', 'ZMIENIONE', 'typ', old_type[:-1], new_type[:-1], 'zmienione_typ',
+                               old_element=old_elements_parsed[old_type][name], new_element=new_elements_parsed[new_type][name])
+            type_changed_elements.add(name)
+
+    # Krok 2: Dodane i usunięte elementy (wspólne pliki), bez rozpoznanych przeniesień
+    for element_type, type_changes in changes.items():
+        singular_et = element_type[:-1]
+        for name, element in type_changes.get('dodane', {}).items():
+            if name not in type_changed_elements and ('dodane', filename, element_type, name) not in moved_elements:
+                yield ChangeRecord(filename, name, singular_et, 'DODANE', 'cały element', '-', 'istnieje', 'dodane',
+                                   new_element=element)
+        for name, element in type_changes.get('usuniete', {}).items():
+            if name not in type_changed_elements and ('usuniete', filename, element_type, name) not in moved_elements:
+                yield ChangeRecord(filename, name, singular_et, 'USUNIĘTE', 'cały element', 'istniał', '-', 'usuniete',
+                                   old_element=element)
+
+    # Krok 3: Przeniesienia do innego widoku tego samego pliku (bez zmiany nazwy) i zmienione atrybuty
+    for element_type, type_changes in changes.items():
+        for name, data in type_changes.get('zmienione', {}).items():
+            if name in type_changed_elements: continue
+            if data['stare'].parent != data['nowe'].parent:
+                yield _move_record(filename, filename, data['stare'], data['nowe'])
+            yield from _attribute_change_records(filename, data['stare'], data['nowe'])
+
+def _attribute_change_records(filename, old_element, new_element):
+    """Rekordy 'zmienione_atrybut' dla każdej właściwości, która różni się (poza kosmetyką) między wersjami elementu."""
+    old_props, new_props = old_element.properties, new_element.properties
+    for key in sorted(old_props.keys() | new_props.keys()):
+        old_val, new_val = old_props.get(key, '[BRAK]'), new_props.get(key, '[BRAK]')
+        if old_val != new_val and (key not in old_props or key not in new_props or
+                                   _normalize_property(key, old_val) != _normalize_property(key, new_val)):
+            yield ChangeRecord(filename, new_element.name, new_element.kind[:-1], 'ZMIENIONE', key, old_val, new_val, 'zmienione_atrybut',
+                               old_element=old_element, new_element=new_element)
+
+def _get_all_changes_as_list(comparison_results, missing_in_new, missing_in_old, folder_old="folder_old", folder_new="folder_new"):
+    with _timed_phase('change_list'):
+        return list(iter_change_records(comparison_results, missing_in_new, missing_in_old, folder_old, folder_new))
+
+def interactive_merge_changes(comparison_results, merge_folder, missing_in_new, missing_in_old, folder_old="folder_old", folder_new="folder_new"):
     print("\nRozpoczynanie szczegółowego interaktywnego łączenia... (t/n)")
     
-    all_changes_to_process = _get_all_changes_as_list(comparison_results, missing_in_new, missing_in_old)
-
-    for change_info in all_changes_to_process:
-        filename = change_info['filename']
-        element_name = change_info['element_name']
-        element_type = change_info['element_type']
-        change_type = change_info['change_type']
-        attribute = change_info['attribute']
-        old_value = change_info['old_value']
-        new_value = change_info['new_value']
-        raw_old_data = change_info['raw_old_data']
-        raw_new_data = change_info['raw_new_data']
-        action_type = change_info['action_type']
-        original_old_path = change_info.get('original_old_path')
-        original_new_path = change_info.get('original_new_path')
-
-        print(f"\n--- Plik: {filename} ---")
-        print(f"Element: {element_name} ({element_type})")
-        print(f"Rodzaj zmiany: {change_type}")
-        print(f"Atrybut: {attribute}")
-        print(f"Stara wartość: {old_value}")
-        print(f"Nowa wartość:  {new_value}")
+    accepted_changes = []
+
+    for change_info in _timed_iter(iter_change_records(comparison_results, missing_in_new, missing_in_old, folder_old, folder_new), 'change_list'):
+        print(f"\n--- Plik: {change_info.filename} ---")
+        print(f"Element: {change_info.element_name} ({change_info.element_type})")
+        print(f"Rodzaj zmiany: {change_info.change_type}")
+        print(f"Atrybut: {change_info.attribute}")
+        print(f"Stara wartość: {change_info.old_value}")
+        print(f"Nowa wartość:  {change_info.new_value}")
 
         decision = input("  Czy chcesz cofnąć tę zmianę (przywrócić starą wersję)? (t/n): ").lower().strip()
         if decision == 't':
-            apply_change_to_file(Path(merge_folder) / filename, action_type, element_name, raw_old_data, raw_new_data, original_old_path, original_new_path)
+            accepted_changes.append(change_info)
+            print("  -> ZAPLANOWANO.")
         else:
             print("  -> POMINIĘTO.")
 
-def run_interactive_comparison_and_merge(folder_old, folder_new, folder_merge, include_elements=None, exclude_elements=None, include_types=None, exclude_types=None):
-    print("🚀 URUCHAMIANIE PORÓWNANIA I INTERAKTYWNEGO ŁĄCZENIA")
-    comparison_results, missing_in_new, missing_in_old = compare_lookml_folders(folder_old, folder_new, include_elements, exclude_elements, include_types, exclude_types)
-    if not comparison_results and not missing_in_new and not missing_in_old:
-        print("\n✅ Brak (pasujących do filtra) zmian do scalenia. Foldery są zgodne.")
-        return
-    setup_merge_directory(folder_merge, folder_new)
-    interactive_merge_changes(comparison_results, folder_merge, missing_in_new, missing_in_old)
-    print("\n\n✅ PROCES ŁĄCZENIA ZAKOŃCZONY!")
+    if accepted_changes:
+        print(f"\nZapisywanie {len(accepted_changes)} zaakceptowanych zmian...")
+        apply_merge_decisions(merge_folder, accepted_changes)
+
+# --- Łączenie wsadowe (bez pytań) sterowane plikiem reguł ---
+
+MERGE_RULE_FIELDS = ('filename', 'element_name', 'element_type', 'attribute', 'change_type')
+MERGE_ACTIONS = ('accept', 'revert')
+
+def load_merge_rules(decision_file):
+    """
+    Wczytuje plik decyzji (JSON lub YAML) w postaci:
+        {"default": "accept",
+         "rules": [{"filename": "views/*", "element_type": "dimension", "attribute": "label", "action": "revert"}]}
+    Pola reguły (filename, element_name, element_type, attribute, change_type) to wzorce glob;
+    brakujące pole pasuje do wszystkiego. `change_type` dopasowywany jest do rodzaju zmiany
+    (DODANE/USUNIĘTE/ZMIENIONE) lub typu akcji (np. zmienione_atrybut). Wygrywa pierwsza pasująca reguła.
+    Akcje: 'accept' - zachowaj wersję 'new', 'revert' - przywróć wersję 'old'.
+    """
+    decision_file = Path(decision_file)
+    with open(decision_file, 'r', encoding='utf-8') as f:
+        if decision_file.suffix.lower() in ('.yml', '.yaml'):
+            try:
+                import yaml
+            except ImportError:
+                raise ImportError("Do wczytania reguł w formacie YAML wymagany jest pakiet PyYAML (pip install pyyaml).")
+            config = yaml.safe_load(f) or {}
+        else:
+            config = json.load(f)
+
+    rules = config.get('rules', [])
+    default_action = config.get('default', 'accept')
+    for position, rule in enumerate(rules):
+        unknown_fields = set(rule) - set(MERGE_RULE_FIELDS) - {'action'}
+        if unknown_fields:
+            raise ValueError(f"Reguła #{position}: nieznane pola {sorted(unknown_fields)}.")
+        if rule.get('action') not in MERGE_ACTIONS:
+            raise ValueError(f"Reguła #{position}: akcja musi być jedną z {MERGE_ACTIONS}, otrzymano {rule.get('action')!r}.")
+    if default_action not in MERGE_ACTIONS:
+        raise ValueError(f"Akcja domyślna musi być jedną z {MERGE_ACTIONS}, otrzymano {default_action!r}.")
+    return {'default': default_action, 'rules': rules}
+
+def _rule_matches(rule, change_info):
+    for rule_field in MERGE_RULE_FIELDS:
+        pattern = rule.get(rule_field)
+        if pattern is None:
+            continue
+        values = [getattr(change_info, rule_field)]
+        if rule_field == 'change_type':
+            values.append(change_info.action_type)
+        if not any(fnmatch.fnmatchcase(str(value), str(pattern)) for value in values):
+            return False
+    return True
+
+def resolve_merge_decisions(all_changes, merge_rules):
+    """Przypisuje każdej zmianie decyzję w jednym przebiegu; zwraca strumień (zmiana, akcja, numer reguły lub None)."""
+    for change_info in all_changes:
+        rule_index = next((i for i, rule in enumerate(merge_rules['rules']) if _rule_matches(rule, change_info)), None)
+        action = merge_rules['default'] if rule_index is None else merge_rules['rules'][rule_index]['action']
+        yield change_info, action, rule_index
+
+def _decision_log_line(change_info, action, rule_index):
+    record = {rule_field: getattr(change_info, rule_field) for rule_field in MERGE_RULE_FIELDS}
+    record.update({
+        'action_type': change_info.action_type,
+        'old_value': change_info.old_value,
+        'new_value': change_info.new_value,
+        'decision': action,
+        'rule': rule_index
+    })
+    return json.dumps(record, ensure_ascii=False) + "\n"
+
+def batch_merge_changes(comparison_results, merge_folder, missing_in_new, missing_in_old, merge_rules, decision_log=None, folder_old="folder_old", folder_new="folder_new"):
+    """
+    Nieinteraktywny odpowiednik interactive_merge_changes - decyzje wynikają z reguł zamiast z input().
+    Każda decyzja zapisywana jest jako linia JSON w `decision_log`, aby scalenie można było odtworzyć i zweryfikować.
+    """
+    print("\nRozpoczynanie wsadowego łączenia według reguł...")
+    changes = _timed_iter(iter_change_records(comparison_results, missing_in_new, missing_in_old, folder_old, folder_new), 'change_list')
+    log_file = open(decision_log, 'w', encoding='utf-8') if decision_log else None
+    accepted_changes, total = [], 0
+    try:
+        for change_info, action, rule_index in resolve_merge_decisions(changes, merge_rules):
+            total += 1
+            if log_file:
+                log_file.write(_decision_log_line(change_info, action, rule_index))
+            if action == 'revert':
+                accepted_changes.append(change_info)
+    finally:
+        if log_file:
+            log_file.close()
+            print(f"Zapisano dziennik decyzji: {decision_log}")
+
+    print(f"Zmian: {total}, do przywrócenia: {len(accepted_changes)}, zachowanych: {total - len(accepted_changes)}.")
+    if accepted_changes:
+        apply_merge_decisions(merge_folder, accepted_changes)
+
+def run_interactive_comparison_and_merge(folder_old, folder_new, folder_merge, include_elements=None, exclude_elements=None, include_types=None, exclude_types=None, cache_dir=None, clear_cache=False, workers=None, manifest_dir=None, include_files=None, exclude_files=None, decision_file=None, decision_log=None, metrics_file=None, profile=None, merge_mode='copy', dry_run=False):
+    """
+    Porównuje foldery i łączy zmiany w folderze 'merge'. Bez `decision_file` pyta o każdą zmianę;
+    z `decision_file` (reguły JSON/YAML, patrz load_merge_rules) działa wsadowo, bez pytań,
+    opcjonalnie zapisując dziennik decyzji do `decision_log`.
+    `merge_mode` wybiera sposób budowy folderu 'merge' (patrz MergeWorkspace); przy `dry_run` nic nie jest
+    zapisywane, a funkcja zwraca wynikowe treści zmienionych plików ({plik: treść lub None}).
+    `metrics_file` / `profile` włączają pomiary etapów i profilowanie (patrz instrumentation).
+    """
+    with instrumentation(metrics_file, profile):
+        merge_rules = load_merge_rules(decision_file) if decision_file else None
+        print("🚀 URUCHAMIANIE PORÓWNANIA I INTERAKTYWNEGO ŁĄCZENIA" if merge_rules is None else "🚀 URUCHAMIANIE PORÓWNANIA I WSADOWEGO ŁĄCZENIA")
+        comparison_results, missing_in_new, missing_in_old = compare_lookml_folders(folder_old, folder_new, include_elements, exclude_elements, include_types, exclude_types, cache_dir=cache_dir, clear_cache=clear_cache, workers=workers, manifest_dir=manifest_dir, include_files=include_files, exclude_files=exclude_files)
+        if not comparison_results and not missing_in_new and not missing_in_old:
+            print("\n✅ Brak (pasujących do filtra) zmian do scalenia. Foldery są zgodne.")
+            return {} if dry_run else None
+        workspace = setup_merge_directory(folder_merge, folder_new, merge_mode, dry_run)
+        if merge_rules is None:
+            interactive_merge_changes(comparison_results, workspace, missing_in_new, missing_in_old, folder_old, folder_new)
+        else:
+            batch_merge_changes(comparison_results, workspace, missing_in_new, missing_in_old, merge_rules, decision_log, folder_old, folder_new)
+        workspace.finish()
+        print("\n\n✅ PROCES ŁĄCZENIA ZAKOŃCZONY!")
+        if dry_run:
+            return workspace.contents
 
 # --- Funkcje raportujące (logika z v2.6.0) ---
 
-def _transform_results_for_legacy_reporting(comparison_results):
-    """Konwertuje wyniki z nowej struktury do starej, oczekiwanej przez funkcje z v2.6.0."""
-    legacy_results = {}
-    for filename, result in comparison_results.items():
-        legacy_results[filename] = {
-            'changes': {et: {k: v for k, v in tc.items()} for et, tc in result['changes'].items()},
-            'old_elements_parsed': {et: {k: v['properties'] for k, v in p.items()} for et, p in result['old_elements_parsed'].items()},
-            'new_elements_parsed': {et: {k: v['properties'] for k, v in p.items()} for et, p in result['new_elements_parsed'].items()}
-        }
-        for et, tc in legacy_results[filename]['changes'].items():
-            if 'zmienione' in tc:
-                for name, change_data in tc['zmienione'].items():
-                    tc['zmienione'][name] = {
-                        'stare': change_data['stare']['properties'],
-                        'nowe': change_data['nowe']['properties']
-                    }
-    return legacy_results
-
-def generate_consolidated_report(comparison_results, missing_in_new, missing_in_old):
+REPORT_HEADERS = ["Plik", "Element", "Rodzaj", "Zmiana", "Atrybut", "Stara wartość", "Nowa wartość"]
+
+def _report_columns(record):
+    return (record.filename, record.element_name, record.element_type, record.change_type,
+            record.attribute, record.old_value, record.new_value)
+
+IMPACT_HEADER = "Wpływ"
+_CONSOLE_IMPACT_LIMIT = 10  # Pola zależne wypisywane w konsoli; pełna lista trafia do raportów HTML i eksportu
+
+def _iter_element_change_rows(comparison_results, reference_index=None):
+    """
+    Wiersze tabeli raportu (bez pozycji o całych plikach, wypisywanych osobno).
+    Przy `reference_index` każdy wiersz ma dodatkową kolumnę z krotką pól zależnych.
+    """
+    for record in _timed_iter(iter_change_records(comparison_results, (), (), reference_index=reference_index), 'change_list'):
+        yield _report_columns(record) if reference_index is None else (*_report_columns(record), record.impact)
+
+def _impact_text(impact, limit=None):
+    if not impact:
+        return '-'
+    shown = ', '.join(impact[:limit])
+    return shown if limit is None or len(impact) <= limit else f"{shown}, ... (+{len(impact) - limit})"
+
+def generate_consolidated_report(comparison_results, missing_in_new, missing_in_old, reference_index=None):
+    with _timed_phase('report_console'):
+        _print_consolidated_report(comparison_results, missing_in_new, missing_in_old, reference_index)
+
+def _print_consolidated_report(comparison_results, missing_in_new, missing_in_old, reference_index=None):
     print(f"\n{'='*120}")
     print(f"PODSUMOWANIE ZMIAN W PLIKACH LOOKML")
     print(f"{'='*120}")
-    headers = ["Plik", "Element", "Rodzaj", "Zmiana", "Atrybut", "Stara wartość", "Nowa wartość"]
+    headers = REPORT_HEADERS
     print(f"{headers[0]:<25} | {headers[1]:<20} | {headers[2]:<15} | {headers[3]:<12} | {headers[4]:<15} | {headers[5]:<25} | {headers[6]:<25}")
     print("-" * 150)
-    rows = []
-    for filename, result in sorted(comparison_results.items()):
-        old_elements_parsed = result['old_elements_parsed']
-        new_elements_parsed = result['new_elements_parsed']
-        type_changed_elements = set()
-        for name in sorted(list(set(k for et in old_elements_parsed.values() for k in et) | set(k for et in new_elements_parsed.values() for k in et))):
-            old_type = next((et[:-1] for et, elements in old_elements_parsed.items() if name in elements), None)
-            new_type = next((et[:-1] for et, elements in new_elements_parsed.items() if name in elements), None)
-            if old_type and new_type and old_type != new_type:
-                rows.append((filename, name, "rodzaj", "ZMIENIONE", "typ", old_type, new_type))
-                type_changed_elements.add(name)
-        changes = result['changes']
-        for element_type, type_changes in changes.items():
-            singular_et = element_type[:-1]
-            for name, props in type_changes.get('dodane', {}).items():
-                if name not in type_changed_elements: rows.append((filename, name, singular_et, "DODANE", "cały element", "-", "istnieje"))
-            for name, props in type_changes.get('usuniete', {}).items():
-                if name not in type_changed_elements: rows.append((filename, name, singular_et, "USUNIĘTE", "cały element", "istniał", "-"))
-            for name, change_info in type_changes.get('zmienione', {}).items():
-                if name in type_changed_elements: continue
-                old_props, new_props = change_info['stare'], change_info['nowe']
-                for key in set(old_props.keys()) | set(new_props.keys()):
-                    old_val, new_val = old_props.get(key, '[BRAK]'), new_props.get(key, '[BRAK]')
-                    if old_val != new_val: rows.append((filename, name, singular_et, "ZMIENIONE", key, old_val, new_val))
-    for row in sorted(rows, key=lambda x: (x[0], x[1])):
+    for row in _iter_element_change_rows(comparison_results, reference_index):
         print(f"{row[0]:<25} | {row[1]:<20} | {row[2]:<15} | {row[3]:<12} | {row[4]:<15} | {str(row[5]):<25} | {str(row[6]):<25}")
+        if reference_index is not None and row[7]:
+            print(f"{'':<25}   ↳ {IMPACT_HEADER.lower()} ({len(row[7])}): {_impact_text(row[7], _CONSOLE_IMPACT_LIMIT)}")
     if missing_in_new: print("\nPLIKI USUNIĘTE:", sorted(missing_in_new))
     if missing_in_old: print("\nPLIKI NOWE:", sorted(missing_in_old))
 
-def generate_html_table_report(comparison_results, missing_in_new, missing_in_old, output_file="lookml_comparison_table_report.html"):
-    headers = ["Plik", "Element", "Rodzaj", "Zmiana", "Atrybut", "Stara wartość", "Nowa wartość"]
-    rows = []
-    for filename, result in sorted(comparison_results.items()):
-        old_elements_parsed = result['old_elements_parsed']
-        new_elements_parsed = result['new_elements_parsed']
-        type_changed_elements = set()
-        for name in sorted(list(set(k for et in old_elements_parsed.values() for k in et) | set(k for et in new_elements_parsed.values() for k in et))):
-            old_type = next((et[:-1] for et, elements in old_elements_parsed.items() if name in elements), None)
-            new_type = next((et[:-1] for et, elements in new_elements_parsed.items() if name in elements), None)
-            if old_type and new_type and old_type != new_type:
-                rows.append((filename, name, "rodzaj", "ZMIENIONE", "typ", old_type, new_type))
-                type_changed_elements.add(name)
-        changes = result['changes']
-        for element_type, type_changes in changes.items():
-            singular_et = element_type[:-1]
-            for name, props in type_changes.get('dodane', {}).items():
-                if name not in type_changed_elements: rows.append((filename, name, singular_et, "DODANE", "cały element", "-", "istnieje"))
-            for name, props in type_changes.get('usuniete', {}).items():
-                if name not in type_changed_elements: rows.append((filename, name, singular_et, "USUNIĘTE", "cały element", "istniał", "-"))
-            for name, change_info in type_changes.get('zmienione', {}).items():
-                if name in type_changed_elements: continue
-                old_props, new_props = change_info['stare'], change_info['nowe']
-                for key in set(old_props.keys()) | set(new_props.keys()):
-                    old_val, new_val = old_props.get(key, '[BRAK]'), new_props.get(key, '[BRAK]')
-                    if old_val != new_val: rows.append((filename, name, singular_et, "ZMIENIONE", key, old_val, new_val))
-    html_content = """
-    <!DOCTYPE html><html><head><title>LookML Comparison Table Report</title><style>body{{font-family:Arial,sans-serif;margin:20px}}table{{width:100%;border-collapse:collapse;margin-bottom:20px;table-layout:fixed}}th,td{{border:1px solid #ddd;padding:8px;text-align:left;vertical-align:top;word-wrap:break-word}}th{{background-color:#f2f2f2}}.long-text{{white-space:nowrap;overflow:hidden;text-overflow:ellipsis;max-width:200px}}.long-text:hover{{overflow:visible;white-space:normal;height:auto;position:absolute;background-color:#fff;border:1px solid #ccc;z-index:1;box-shadow:2px 2px 5px rgba(0,0,0,.2);max-width:500px}}ul{{list-style-type:none;padding:0}}li{{margin-bottom:5px}}</style></head><body>
-    <h1>LookML Comparison Table Report</h1><h2>Summary of Changes</h2><table><thead><tr>{th}</tr></thead><tbody>{tbody}</tbody></table>
-    <h2>Files Missing in New Folder</h2><ul>{missing_new}</ul><h2>New Files in New Folder</h2><ul>{missing_old}</ul></body></html>
-    """.format(
-        th="".join([f"<th>{h}</th>" for h in headers]),
-        tbody = "".join([
-            "<tr>" + " ".join([
-            f'<td class="long-text" title="{html.escape(str(c))}">{html.escape(str(c))}</td>'
-            for c in r
-            ]) + "</tr>"
-            for r in sorted(rows, key=lambda x: (x[0], x[1]))
-        ]),
-        missing_new="".join([f"<li>{f}</li>" for f in sorted(missing_in_new)]),
-        missing_old="".join([f"<li>{f}</li>" for f in sorted(missing_in_old)])
-    )
-    with open(output_file, "w", encoding="utf-8") as f:
-        f.write(html_content)
+_HTML_REPORT_HEAD = """
+    <!DOCTYPE html><html><head><title>LookML Comparison Table Report</title><style>body{font-family:Arial,sans-serif;margin:20px}table{width:100%;border-collapse:collapse;margin-bottom:20px;table-layout:fixed}th,td{border:1px solid #ddd;padding:8px;text-align:left;vertical-align:top;word-wrap:break-word}th{background-color:#f2f2f2}.long-text{white-space:nowrap;overflow:hidden;text-overflow:ellipsis;max-width:200px}.long-text:hover{overflow:visible;white-space:normal;height:auto;position:absolute;background-color:#fff;border:1px solid #ccc;z-index:1;box-shadow:2px 2px 5px rgba(0,0,0,.2);max-width:500px}ul{list-style-type:none;padding:0}li{margin-bottom:5px}</style></head><body>
+    <h1>LookML Comparison Table Report</h1><h2>Summary of Changes</h2><table><thead><tr>"""
+
+def generate_html_table_report(comparison_results, missing_in_new, missing_in_old, output_file="lookml_comparison_table_report.html", reference_index=None):
+    """
+    Zapisuje raport HTML przyrostowo - wiersz po wierszu, bez budowania całej strony w pamięci.
+    Przy `reference_index` tabela ma dodatkową kolumnę z polami zależnymi od zmienionego elementu.
+    """
+    headers = REPORT_HEADERS if reference_index is None else [*REPORT_HEADERS, IMPACT_HEADER]
+    with _timed_phase('report_html'), open(output_file, "w", encoding="utf-8") as f:
+        f.write(_HTML_REPORT_HEAD)
+        f.write("".join([f"<th>{h}</th>" for h in headers]))
+        f.write("</tr></thead><tbody>")
+        for row in _iter_element_change_rows(comparison_results, reference_index):
+            if reference_index is not None:
+                row = (*row[:7], _impact_text(row[7]))
+            f.write("<tr>" + " ".join([
+                f'<td class="long-text" title="{html.escape(str(c))}">{html.escape(str(c))}</td>'
+                for c in row
+            ]) + "</tr>")
+        f.write("</tbody></table>\n    <h2>Files Missing in New Folder</h2><ul>")
+        f.write("".join([f"<li>{html.escape(f)}</li>" for f in sorted(missing_in_new)]))
+        f.write("</ul><h2>New Files in New Folder</h2><ul>")
+        f.write("".join([f"<li>{html.escape(f)}</li>" for f in sorted(missing_in_old)]))
+        f.write("</ul></body></html>\n    ")
     print(f"Wygenerowano raport HTML: {output_file}")
 
-def run_complete_comparison(folder_old, folder_new, html_table=False, include_elements=None, exclude_elements=None, include_types=None, exclude_types=None):
-    print("🚀 URUCHAMIANIE PORÓWNANIA LOOKML (STYL v2.6.0)")
-    comparison_results, missing_in_new, missing_in_old = compare_lookml_folders(folder_old, folder_new, include_elements, exclude_elements, include_types, exclude_types)
-    
-    if not comparison_results and not missing_in_new and not missing_in_old:
-        print("\n✅ Brak (pasujących do filtra) zmian do wyświetlenia.")
+# --- Raport HTML sterowany danymi: zwarte JSON + stronicowana (wirtualna) tabela z filtrami ---
+
+_HTML_INLINE_CHUNK_ROWS = 5000  # Wiersze na jeden znacznik <script> w trybie osadzonym
+
+_HTML_PAGED_REPORT_HEAD = """<!DOCTYPE html><html><head><meta charset="utf-8"><title>LookML Comparison Report</title><style>
+body{font-family:Arial,sans-serif;margin:20px}h1{margin:0 0 10px}#filters{display:flex;gap:8px;flex-wrap:wrap;margin:10px 0}
+select,input{padding:4px;max-width:420px}#status{color:#666;margin:6px 0}
+.grid{display:grid;grid-template-columns:2fr 1.5fr 1fr 1fr 1fr 2fr 2fr}.grid.impact{grid-template-columns:2fr 1.5fr 1fr 1fr 1fr 2fr 2fr 1.5fr}
+#header{font-weight:bold;background:#f2f2f2;border:1px solid #ddd}#header div,.row div{padding:6px 8px;overflow:hidden;white-space:nowrap;text-overflow:ellipsis}
+#scroller{height:60vh;overflow-y:auto;position:relative;border:1px solid #ddd;border-top:none}#spacer{position:relative}
+.row{position:absolute;left:0;right:0;height:28px;border-bottom:1px solid #eee;cursor:pointer}.row:hover{background:#f7f7ff}
+#details{white-space:pre-wrap;background:#fafafa;border:1px solid #ddd;padding:8px;margin-top:10px;min-height:2em}
+#summary{border-collapse:collapse;margin-top:10px}#summary th,#summary td{border:1px solid #ddd;padding:4px 8px;text-align:right}
+#summary td:first-child{text-align:left;color:#06c;cursor:pointer}
+</style><script>window.LOOKML_ROWS=[];window.LOOKML_CHUNK=function(i,d){Array.prototype.push.apply(LOOKML_ROWS,d);if(window.LOOKML_ON_CHUNK)LOOKML_ON_CHUNK();};</script>
+</head><body><h1>LookML Comparison Report</h1>
+<div id="filters"><select id="f-file"><option value="">All files</option></select><select id="f-kind"><option value="">All kinds</option></select>
+<select id="f-change"><option value="">All changes</option></select><input id="f-text" placeholder="Search element, attribute, value"></div>
+<div id="status"></div><div id="header" class="grid"></div><div id="scroller"><div id="spacer"></div></div><div id="details">Click a row to see full values.</div>
+<h2>Summary per file</h2><table id="summary"></table>
+"""
+
+_HTML_PAGED_REPORT_APP = r"""<script>(function(){
+var M=LOOKML_META,rows=LOOKML_ROWS,ROW_H=28,view=[],$=function(id){return document.getElementById(id);};
+var HEAD=["File","Element","Kind","Change","Attribute","Old value","New value"],IMPACT=M.impact;
+if(IMPACT)HEAD.push("Impact");
+function esc(v){return String(v==null?"":v).replace(/[&<>"]/g,function(c){return{"&":"&amp;","<":"&lt;",">":"&gt;",'"':"&quot;"}[c];});}
+function fill(id,values){var s=$(id);values.forEach(function(v,i){var o=document.createElement("option");o.value=i;o.textContent=v;s.appendChild(o);});s.onchange=filter;}
+function cells(r){var c=[M.files[r[0]],r[1],M.kinds[r[2]],M.changes[r[3]],r[4],r[5],r[6]];if(IMPACT)c.push(r[7]&&r[7].length?r[7].length+": "+r[7].join(", "):"-");return c;}
+function filter(){var f=$("f-file").value,k=$("f-kind").value,c=$("f-change").value,q=$("f-text").value.toLowerCase();view=[];
+for(var i=0;i<rows.length;i++){var r=rows[i];if(f!==""&&r[0]!=f||k!==""&&r[2]!=k||c!==""&&r[3]!=c)continue;
+if(q&&(r[1]+"\u0000"+r[4]+"\u0000"+r[5]+"\u0000"+r[6]+(IMPACT&&r[7]?"\u0000"+r[7].join("\u0000"):"")).toLowerCase().indexOf(q)<0)continue;view.push(i);}
+$("spacer").style.height=view.length*ROW_H+"px";status();render();}
+function status(){$("status").textContent=view.length+" of "+rows.length+" rows"+(rows.length<M.total?" (loading "+rows.length+"/"+M.total+")":"");}
+function render(){var sc=$("scroller"),first=Math.max(0,Math.floor(sc.scrollTop/ROW_H)-10),last=Math.min(view.length,first+Math.ceil(sc.clientHeight/ROW_H)+20),h=[];
+for(var j=first;j<last;j++){h.push('<div class="row grid'+(IMPACT?' impact':'')+'" style="top:'+j*ROW_H+'px" data-i="'+view[j]+'">'+cells(rows[view[j]]).map(function(v){return"<div>"+esc(v)+"</div>";}).join("")+"</div>");}
+$("spacer").innerHTML=h.join("");}
+if(IMPACT)$("header").className+=" impact";$("header").innerHTML=HEAD.map(function(h){return"<div>"+h+"</div>";}).join("");
+$("scroller").onscroll=render;$("f-text").oninput=filter;
+$("spacer").onclick=function(e){var row=e.target.closest(".row");if(!row)return;var c=cells(rows[row.getAttribute("data-i")]);
+$("details").textContent=HEAD.map(function(h,i){return h+": "+c[i];}).join("\n");};
+fill("f-file",M.files);fill("f-kind",M.kinds);fill("f-change",M.changes);
+var t=["<tr><th>File</th>"+M.changes.map(function(c){return"<th>"+esc(c)+"</th>";}).join("")+"<th>Total</th></tr>"];
+M.files.forEach(function(name,i){var counts=M.summary[i]||{},total=0;t.push("<tr><td data-file='"+i+"'>"+esc(name)+"</td>"+M.changes.map(function(_,c){total+=counts[c]||0;return"<td>"+(counts[c]||"")+"</td>";}).join("")+"<td>"+total+"</td></tr>");});
+$("summary").innerHTML=t.join("");$("summary").onclick=function(e){var f=e.target.getAttribute("data-file");if(f!==null){$("f-file").value=f;filter();}};
+window.LOOKML_ON_CHUNK=filter;
+(function load(n){if(n>=M.chunks.length)return;var s=document.createElement("script");s.src=M.chunks[n];s.onload=function(){load(n+1);};document.body.appendChild(s);})(0);
+filter();})();</script></body></html>
+"""
+
+def _script_json(value):
+    """
+    JSON do osadzenia w <script>: każdy '<' zapisywany jest jako \\u003c, więc żadna wartość (np. '</script>'
+    lub '<!--' z '<script') nie zmieni stanu parsera HTML.
+    """
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':')).replace('<', '\\u003c')
+
+def generate_html_paged_report(comparison_results, missing_in_new, missing_in_old, output_file="lookml_comparison_report.html", chunk_rows=None, folder_old="folder_old", folder_new="folder_new", reference_index=None):
+    """
+    Raport HTML dla bardzo dużych różnic: rekordy zmian zapisywane są strumieniowo jako zwarte JSON
+    (pliki, rodzaje i typy zmian kodowane słownikowo) i wyświetlane w wirtualnej tabeli, która renderuje
+    tylko widoczne wiersze, z filtrami po pliku, rodzaju, typie zmiany i tekście oraz podsumowaniem dla plików.
+    Przy `chunk_rows` dane trafiają do osobnych plików '<nazwa>_data/chunk_NNNNN.js' wczytywanych przez stronę,
+    w przeciwnym razie są osadzone w samym raporcie. Przy `reference_index` wiersze mają kolumnę 'Impact'
+    z polami zależnymi od zmienionego elementu (pełna lista w szczegółach wiersza).
+    """
+    output_file = Path(output_file)
+    chunk_dir = output_file.with_name(f"{output_file.stem}_data") if chunk_rows else None
+    if chunk_dir is not None:
+        if chunk_dir.exists() and not chunk_dir.is_dir():
+            raise FileExistsError(f"{chunk_dir} istnieje i nie jest katalogiem danych raportu.")
+        chunk_dir.mkdir(parents=True, exist_ok=True)
+        for old_chunk in chunk_dir.glob('chunk_*.js'):  # Usuwane są tylko pliki danych poprzedniego raportu
+            old_chunk.unlink()
+    files, kinds, change_types = {}, {}, {}
+    summary = defaultdict(lambda: defaultdict(int))
+    chunk_files, total = [], 0
+
+    with _timed_phase('report_html'), open(output_file, "w", encoding="utf-8") as f:
+        f.write(_HTML_PAGED_REPORT_HEAD)
+
+        def write_chunk(chunk):
+            script = f"LOOKML_CHUNK({len(chunk_files)},{_script_json(chunk)});\n"
+            if chunk_dir is None:
+                f.write(f"<script>{script}</script>\n")
+                return
+            chunk_file = chunk_dir / f"chunk_{len(chunk_files):05d}.js"
+            with open(chunk_file, "w", encoding="utf-8") as chunk_f:
+                chunk_f.write(script)
+            chunk_files.append(f"{chunk_dir.name}/{chunk_file.name}")
+
+        chunk = []
+        records = iter_change_records(comparison_results, missing_in_new, missing_in_old, folder_old, folder_new, reference_index)
+        for record in _timed_iter(records, 'change_list'):
+            file_index = files.setdefault(record.filename, len(files))
+            change_index = change_types.setdefault(record.change_type, len(change_types))
+            row = [file_index, record.element_name, kinds.setdefault(record.element_type, len(kinds)),
+                   change_index, record.attribute, record.old_value, record.new_value]
+            if reference_index is not None:
+                row.append(record.impact)
+            chunk.append(row)
+            summary[file_index][change_index] += 1
+            total += 1
+            if len(chunk) == (chunk_rows or _HTML_INLINE_CHUNK_ROWS):
+                write_chunk(chunk)
+                chunk = []
+        if chunk:
+            write_chunk(chunk)
+
+        meta = {'files': list(files), 'kinds': list(kinds), 'changes': list(change_types),
+                'summary': summary, 'chunks': chunk_files, 'total': total, 'impact': reference_index is not None}
+        f.write(f"<script>window.LOOKML_META={_script_json(meta)};</script>\n")
+        f.write(_HTML_PAGED_REPORT_APP)
+    print(f"Wygenerowano stronicowany raport HTML ({total} zmian): {output_file}")
+
+# --- Eksport zmian do formatów maszynowych (JSONL / CSV) ---
+
+# Stały schemat eksportu: kolejność kolumn CSV i kluczy JSON. Nowe pola dopisywane są wyłącznie na końcu.
+EXPORT_FIELDS = ('filename', 'element_name', 'element_type', 'change_type', 'action_type',
+                 'attribute', 'old_value', 'new_value', 'old_filename', 'impact')
+EXPORT_FORMATS = ('jsonl', 'csv')
+
+def _export_row(record):
+    return [getattr(record, export_field) for export_field in EXPORT_FIELDS]
+
+def generate_change_export(comparison_results, missing_in_new, missing_in_old, output_file, export_format=None, folder_old="folder_old", folder_new="folder_new", reference_index=None):
+    """
+    Zapisuje wszystkie rekordy zmian (także pliki usunięte i dodane) jako JSONL lub CSV o stałym schemacie
+    (EXPORT_FIELDS). Rekordy zapisywane są strumieniowo, w miarę ich powstawania, bez budowania listy zmian.
+    Format wynika z rozszerzenia pliku, o ile nie podano `export_format`. Pole 'impact' (lista pól zależnych;
+    w CSV rozdzielona spacjami) wypełniane jest tylko przy `reference_index`.
+    """
+    export_format = (export_format or Path(output_file).suffix.lstrip('.')).lower()
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"Nieznany format eksportu {export_format!r}; dostępne: {EXPORT_FORMATS}.")
+    rows = 0
+    with _timed_phase('report_export'), open(output_file, 'w', encoding='utf-8', newline='') as f:
+        records = _timed_iter(iter_change_records(comparison_results, missing_in_new, missing_in_old, folder_old, folder_new, reference_index), 'change_list')
+        if export_format == 'csv':
+            writer = csv.writer(f)
+            writer.writerow(EXPORT_FIELDS)
+            impact_column = EXPORT_FIELDS.index('impact')
+            for record in records:
+                row = _export_row(record)
+                if row[impact_column] is not None:
+                    row[impact_column] = ' '.join(row[impact_column])
+                writer.writerow(row)
+                rows += 1
+        else:
+            for record in records:
+                f.write(json.dumps(dict(zip(EXPORT_FIELDS, _export_row(record))), ensure_ascii=False) + "\n")
+                rows += 1
+    _add_counter('export_rows', rows)
+    print(f"Wyeksportowano {rows} zmian ({export_format.upper()}): {output_file}")
+
+def run_complete_comparison(folder_old, folder_new, html_table=False, include_elements=None, exclude_elements=None, include_types=None, exclude_types=None, cache_dir=None, clear_cache=False, workers=None, manifest_dir=None, include_files=None, exclude_files=None, metrics_file=None, profile=None, git_repo=None, export_file=None, html_paged=False, html_chunk_rows=None, impact=False):
+    with instrumentation(metrics_file, profile):
+        print("🚀 URUCHAMIANIE PORÓWNANIA LOOKML (STYL v2.6.0)")
+        comparison_results, missing_in_new, missing_in_old = compare_lookml_folders(folder_old, folder_new, include_elements, exclude_elements, include_types, exclude_types, cache_dir=cache_dir, clear_cache=clear_cache, workers=workers, manifest_dir=manifest_dir, include_files=include_files, exclude_files=exclude_files, git_repo=git_repo)
+
+        reference_index = None
+        if impact and git_repo is not None:
+            print("Uwaga: analiza wpływu (impact) wymaga folderu roboczego - pomijam ją przy porównaniu rewizji git.")
+        elif impact:
+            # Pliki już sparsowane przy porównaniu nie są czytane ponownie
+            parsed = {filename: result['new_elements_parsed'] for filename, result in comparison_results.items()}
+            reference_index = build_reference_index(folder_new, include_files, exclude_files, cache_dir, parsed)
+
+        if export_file:
+            generate_change_export(comparison_results, missing_in_new, missing_in_old, export_file, folder_old=folder_old, folder_new=folder_new,
+                                   reference_index=reference_index)
+
+        if not comparison_results and not missing_in_new and not missing_in_old:
+            print("\n✅ Brak (pasujących do filtra) zmian do wyświetlenia.")
+            return
+
+        generate_consolidated_report(comparison_results, missing_in_new, missing_in_old, reference_index)
+        if html_table:
+            generate_html_table_report(comparison_results, missing_in_new, missing_in_old, reference_index=reference_index)
+        if html_paged:
+            generate_html_paged_report(comparison_results, missing_in_new, missing_in_old, chunk_rows=html_chunk_rows,
+                                       folder_old=folder_old, folder_new=folder_new, reference_index=reference_index)
+
+MATRIX_HEADERS = ["Plik", "Element", "Rodzaj"]
+
+def generate_matrix_report(matrix, differences, output_file=None):
+    """
+    Wypisuje zbiorczą macierz różnic (wiersz na element, kolumna na cel) oraz podsumowanie dla celów;
+    przy `output_file` zapisuje tę samą tabelę jako raport HTML.
+    """
+    labels = list(matrix)
+    with _timed_phase('report_console'):
+        print(f"\n{'='*120}")
+        print(f"MACIERZ RÓŻNIC WZGLĘDEM WERSJI BAZOWEJ (celów: {len(labels)})")
+        print(f"{'='*120}")
+        for label, (comparison_results, missing_in_new, missing_in_old) in matrix.items():
+            elements = sum(1 for key, cell in differences.items() if label in cell and key[2] != 'plik')
+            print(f"{label}: {elements} zmienionych elementów w {len(comparison_results)} plikach, "
+                  f"plików usuniętych: {len(missing_in_new)}, nowych: {len(missing_in_old)}")
+        widths = [max(len(label), 12) for label in labels]
+        print(f"\n{MATRIX_HEADERS[0]:<25} | {MATRIX_HEADERS[1]:<20} | {MATRIX_HEADERS[2]:<15} | " +
+              " | ".join(f"{label:<{width}}" for label, width in zip(labels, widths)))
+        print("-" * (66 + sum(width + 3 for width in widths)))
+        for (filename, element_name, element_type), cell in differences.items():
+            print(f"{filename:<25} | {element_name:<20} | {element_type:<15} | " +
+                  " | ".join(f"{_matrix_cell(cell, label):<{width}}" for label, width in zip(labels, widths)))
+    if output_file is None:
         return
+    with _timed_phase('report_html'), open(output_file, "w", encoding="utf-8") as f:
+        f.write(_HTML_REPORT_HEAD)
+        f.write("".join([f"<th>{html.escape(h)}</th>" for h in [*MATRIX_HEADERS, *labels]]))
+        f.write("</tr></thead><tbody>")
+        for key, cell in differences.items():
+            f.write("<tr>" + " ".join([f"<td>{html.escape(str(c))}</td>" for c in (*key, *(_matrix_cell(cell, label) for label in labels))]) + "</tr>")
+        f.write("</tbody></table></body></html>\n")
+    print(f"Wygenerowano raport HTML macierzy: {output_file}")
 
-    legacy_results = _transform_results_for_legacy_reporting(comparison_results)
-    
-    generate_consolidated_report(legacy_results, missing_in_new, missing_in_old)
+def run_matrix_comparison(baseline_folder, target_folders, html_table=False, include_elements=None, exclude_elements=None, include_types=None, exclude_types=None, cache_dir=None, clear_cache=False, include_files=None, exclude_files=None, metrics_file=None, profile=None, pair_reports=False):
+    """
+    Porównuje folder bazowy z wieloma folderami docelowymi w jednym przebiegu parsowania (compare_lookml_matrix)
+    i wypisuje zbiorczą macierz różnic; przy `pair_reports` także pełne podsumowanie dla każdej pary.
+    Zwraca {etykieta: (comparison_results, missing_in_new, missing_in_old)}.
+    """
+    with instrumentation(metrics_file, profile):
+        print("🚀 URUCHAMIANIE PORÓWNANIA LOOKML (MACIERZ)")
+        matrix = compare_lookml_matrix(baseline_folder, target_folders, include_elements, exclude_elements, include_types, exclude_types,
+                                       cache_dir=cache_dir, clear_cache=clear_cache, include_files=include_files, exclude_files=exclude_files)
+        if pair_reports:
+            for label, (comparison_results, missing_in_new, missing_in_old) in matrix.items():
+                print(f"\n### {baseline_folder} -> {label}")
+                generate_consolidated_report(comparison_results, missing_in_new, missing_in_old)
+        differences = matrix_element_differences(matrix)
+        if not differences:
+            print("\n✅ Brak (pasujących do filtra) zmian do wyświetlenia.")
+            return matrix
+        generate_matrix_report(matrix, differences, "lookml_comparison_matrix_report.html" if html_table else None)
+    return matrix
+
+# --- Tryb obserwacji: przyrostowe porównanie plików zmienionych od ostatniego przebiegu ---
+
+def _file_signature(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_size, stat.st_mtime_ns)
+
+def _snapshot_tree(folder, include_files, exclude_files):
+    """Zwraca {ścieżka względna: (rozmiar, mtime_ns)} wszystkich obserwowanych plików folderu."""
+    snapshot = {}
+    if Path(folder).is_dir():
+        for rel_path, path in iter_lookml_files(folder, include_files, exclude_files):
+            signature = _file_signature(path)
+            if signature is not None:
+                snapshot[rel_path] = signature
+    return snapshot
+
+def _refresh_snapshot(snapshot, folder, rel_paths, include_files, exclude_files):
+    """
+    Aktualizuje migawkę folderu i zwraca zbiór plików, których rozmiar lub mtime się zmienił.
+    `rel_paths` ogranicza sprawdzenie do wskazanych plików; None oznacza ponowny przegląd całego folderu.
+    """
+    if rel_paths is None:
+        current = _snapshot_tree(folder, include_files, exclude_files)
+        changed = {f for f in snapshot.keys() | current.keys() if snapshot.get(f) != current.get(f)}
+        snapshot.clear()
+        snapshot.update(current)
+        return changed
+    changed = set()
+    for rel_path in rel_paths:
+        if not _is_lookml_path(rel_path, include_files, exclude_files):
+            continue
+        signature = _file_signature(Path(folder) / rel_path)
+        if signature != snapshot.get(rel_path):
+            changed.add(rel_path)
+            if signature is None:
+                del snapshot[rel_path]
+            else:
+                snapshot[rel_path] = signature
+    return changed
+
+def _start_event_watcher(folders, events):
+    """
+    Uruchamia obserwatora zdarzeń systemu plików (opcjonalny pakiet watchdog), który umieszcza
+    w kolejce `events` pary (ścieżka, czy_katalog). Zwraca obserwatora lub None, gdy pakiet jest niedostępny.
+    """
+    try:
+        from watchdog.observers import Observer
+        from watchdog.events import FileSystemEventHandler
+    except ImportError:
+        return None
+
+    class _QueueHandler(FileSystemEventHandler):
+        def on_any_event(self, event):
+            if event.is_directory and event.event_type == 'modified':
+                return  # Zmiana zawartości katalogu - właściwe zdarzenie dotyczy pliku
+            events.put((event.src_path, event.is_directory))
+            if getattr(event, 'dest_path', None):
+                events.put((event.dest_path, event.is_directory))
+
+    observer = Observer()
+    for folder in folders:
+        if Path(folder).is_dir():
+            observer.schedule(_QueueHandler(), str(folder), recursive=True)
+    observer.start()
+    return observer
+
+def _wait_for_touched_paths(events, folders, poll_interval, debounce):
+    """
+    Czeka na zdarzenia i grupuje te, które nadejdą w odstępie `debounce` (edytory zapisują plik w kilku krokach).
+    Zwraca {indeks folderu: zbiór ścieżek względnych lub None (przejrzyj cały folder)} albo None po upływie `poll_interval`.
+    """
+    try:
+        pending = [events.get(timeout=poll_interval)]
+    except queue.Empty:
+        return None
+    while True:
+        time.sleep(debounce)
+        if events.empty():
+            break
+        while not events.empty():
+            pending.append(events.get_nowait())
+
+    roots = [os.path.abspath(folder) for folder in folders]
+    touched = {}
+    for path, is_directory in pending:
+        path = os.path.abspath(path)
+        # Najdłuższy pasujący folder wygrywa, gdyby jeden był zagnieżdżony w drugim
+        for index in sorted(range(len(roots)), key=lambda i: -len(roots[i])):
+            if path == roots[index] or path.startswith(roots[index] + os.sep):
+                if is_directory:
+                    touched[index] = None
+                elif touched.get(index, set()) is not None:
+                    touched.setdefault(index, set()).add(Path(os.path.relpath(path, roots[index])).as_posix())
+                break
+    return touched
+
+def _rediff_watched_file(state, filename, folder_old, folder_new, cache_dir, element_filters):
+    """Porównuje ponownie jeden plik i aktualizuje wyniki; sparsowana wersja 'old' jest brana z pamięci."""
+    comparison_results = state['comparison_results']
+    comparison_results.pop(filename, None)
+    state['missing_in_new'].discard(filename)
+    state['missing_in_old'].discard(filename)
+    in_old, in_new = filename in state['old_snapshot'], filename in state['new_snapshot']
+    if in_old and not in_new:
+        state['missing_in_new'].add(filename)
+    elif in_new and not in_old:
+        state['missing_in_old'].add(filename)
+    if not (in_old and in_new):
+        return
+
+    old_path, new_path = Path(folder_old) / filename, Path(folder_new) / filename
+    try:
+        old_elements = state['old_parsed'].get(filename)
+        if old_elements is None:
+            old_elements = state['old_parsed'][filename] = parse_lookml_file(old_path, cache_dir)
+        new_elements = parse_lookml_file(new_path, cache_dir)
+    except Exception as e:
+        print(f"Błąd podczas porównywania pliku {filename}: {e}")
+        return
+    changes = _diff_parsed_elements(old_elements, new_elements, *element_filters)
+    if changes:
+        comparison_results[filename] = _comparison_result(changes, old_elements, new_elements, old_path, new_path)
+
+def _update_watched_references(state, filenames, folder_new, cache_dir):
+    """Przyrostowo aktualizuje indeks odwołań dla zmienionych plików 'new' (bez przebudowy całości)."""
+    reference_index = state['reference_index']
+    for filename in filenames:
+        if filename not in state['new_snapshot']:
+            reference_index.remove_file(filename)
+            continue
+        result = state['comparison_results'].get(filename)
+        try:
+            elements = result['new_elements_parsed'] if result else parse_lookml_file(Path(folder_new) / filename, cache_dir)
+        except (OSError, UnicodeDecodeError) as e:
+            print(f"Błąd: Nie można odczytać pliku {filename}: {e}")
+            reference_index.remove_file(filename)
+            continue
+        reference_index.add_file(filename, elements)
+
+def _print_watch_summary(state, html_table):
+    reference_index = state['reference_index']
+    if not state['comparison_results'] and not state['missing_in_new'] and not state['missing_in_old']:
+        print("\n✅ Brak (pasujących do filtra) zmian do wyświetlenia.")
+    else:
+        generate_consolidated_report(state['comparison_results'], state['missing_in_new'], state['missing_in_old'], reference_index)
     if html_table:
-        generate_html_table_report(legacy_results, missing_in_new, missing_in_old)
+        generate_html_table_report(state['comparison_results'], state['missing_in_new'], state['missing_in_old'], reference_index=reference_index)
+
+def run_watch_comparison(folder_old, folder_new, html_table=False, include_elements=None, exclude_elements=None, include_types=None, exclude_types=None, cache_dir=None, workers=None, include_files=None, exclude_files=None, poll_interval=1.0, debounce=0.05, use_events=True, stop_event=None, impact=False):
+    """
+    Tryb obserwacji: po pełnym porównaniu trzyma w pamięci wyniki oraz sparsowane pliki 'old'
+    i po każdym zapisie porównuje ponownie tylko zmienione pliki, odświeżając podsumowanie (i raport HTML).
+    Przy `impact` indeks odwołań (analiza wpływu) aktualizowany jest tylko dla zmienionych plików.
+    Zmiany wykrywane są ze zdarzeń systemu plików (pakiet watchdog, jeśli jest zainstalowany), a w przeciwnym
+    razie przez odpytywanie rozmiarów i czasów modyfikacji co `poll_interval` sekund.
+    Działa do Ctrl+C lub ustawienia `stop_event` (threading.Event).
+    """
+    include_files = DEFAULT_INCLUDE_FILES if include_files is None else tuple(include_files)
+    exclude_files = DEFAULT_EXCLUDE_FILES if exclude_files is None else tuple(exclude_files)
+    folders = (folder_old, folder_new)
+    element_filters = (include_elements, exclude_elements, include_types, exclude_types)
+
+    print("👀 URUCHAMIANIE PORÓWNANIA LOOKML W TRYBIE OBSERWACJI")
+    # Migawki przed porównaniem - zapisy wykonane w jego trakcie zostaną wykryte w pierwszej iteracji
+    snapshots = [_snapshot_tree(folder, include_files, exclude_files) for folder in folders]
+    comparison_results, missing_in_new, missing_in_old = compare_lookml_folders(folder_old, folder_new, *element_filters, cache_dir=cache_dir, workers=workers, include_files=include_files, exclude_files=exclude_files)
+    state = {
+        'comparison_results': comparison_results,
+        'missing_in_new': missing_in_new,
+        'missing_in_old': missing_in_old,
+        'old_parsed': {filename: result['old_elements_parsed'] for filename, result in comparison_results.items()},
+        'old_snapshot': snapshots[0],
+        'new_snapshot': snapshots[1],
+        'reference_index': None,
+    }
+    if impact:
+        parsed = {filename: result['new_elements_parsed'] for filename, result in comparison_results.items()}
+        state['reference_index'] = build_reference_index(folder_new, include_files, exclude_files, cache_dir, parsed)
+    _print_watch_summary(state, html_table)
+
+    events = queue.Queue()
+    observer = _start_event_watcher(folders, events) if use_events else None
+    if observer is None:
+        print(f"Obserwacja przez odpytywanie co {poll_interval} s (zdarzenia systemu plików wymagają pakietu watchdog).")
+    else:
+        print("Obserwacja zdarzeń systemu plików (watchdog).")
+    print("Naciśnij Ctrl+C, aby zakończyć.")
+
+    try:
+        while stop_event is None or not stop_event.is_set():
+            if observer is None:
+                if stop_event is not None:
+                    stop_event.wait(poll_interval)
+                else:
+                    time.sleep(poll_interval)
+                touched = {0: None, 1: None}
+            else:
+                touched = _wait_for_touched_paths(events, folders, poll_interval, debounce)
+                if touched is None:
+                    continue
+
+            start = time.perf_counter()
+            changed_old = _refresh_snapshot(snapshots[0], folder_old, touched[0], include_files, exclude_files) if 0 in touched else set()
+            changed_new = _refresh_snapshot(snapshots[1], folder_new, touched[1], include_files, exclude_files) if 1 in touched else set()
+            if not changed_old and not changed_new:
+                continue
+            for filename in changed_old:
+                state['old_parsed'].pop(filename, None)
+            for filename in sorted(changed_old | changed_new):
+                _rediff_watched_file(state, filename, folder_old, folder_new, cache_dir, element_filters)
+            if state['reference_index'] is not None:
+                _update_watched_references(state, sorted(changed_new), folder_new, cache_dir)
+            state['comparison_results'] = ComparisonResults(sorted(state['comparison_results'].items()))
+            elapsed_ms = (time.perf_counter() - start) * 1000
+
+            print(f"\n[{time.strftime('%H:%M:%S')}] Zmienione pliki: {', '.join(sorted(changed_old | changed_new))} "
+                  f"(ponowne porównanie: {elapsed_ms:.1f} ms)")
+            _print_watch_summary(state, html_table)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if observer is not None:
+            observer.stop()
+            observer.join()
+    print("\nZakończono tryb obserwacji.")
+    return state['comparison_results'], state['missing_in_new'], state['missing_in_old']
 
 if __name__ == "__main__":
     current_dir = Path(__file__).parent
@@ -531,3 +2583,39 @@ if __name__ == "__main__":
     #     exclude_elements=['id', 'order_id'],
     #     include_types=['dimension']
     # )
+
+    # Przykład użycia pamięci podręcznej parsera (np. w CI), parsowane są tylko pliki o zmienionej treści:
+    # run_complete_comparison(folder_old, folder_new, cache_dir=current_dir / ".lookml_cache")
+
+    # Przykład łączenia wsadowego (CI) według pliku reguł, z dziennikiem decyzji:
+    # run_interactive_comparison_and_merge(folder_old, folder_new, folder_merge,
+    #                                      decision_file=current_dir / "merge_rules.json",
+    #                                      decision_log=current_dir / "merge_decisions.jsonl")
+
+    # Przykład próbnego łączenia bez zapisu (treści plików po scaleniu zwracane w słowniku):
+    # merged = run_interactive_comparison_and_merge(folder_old, folder_new, folder_merge,
+    #                                               decision_file=current_dir / "merge_rules.json", dry_run=True)
+
+    # Przykład z metrykami etapów (JSON) i profilowaniem pamięci:
+    # run_complete_comparison(folder_old, folder_new, metrics_file=current_dir / "lookml_metrics.json", profile="tracemalloc")
+
+    # Przykład porównania równoległego (pula 16 procesów):
+    # run_complete_comparison(folder_old, folder_new, workers=16)
+
+    # Przykład trybu obserwacji - podsumowanie i raport HTML odświeżane po każdym zapisie w folder_new:
+    # run_watch_comparison(folder_old, folder_new, html_table=True)
+
+    # Przykład porównania dwóch rewizji repozytorium git (tag wydania i gałąź main), bez checkout:
+    # run_complete_comparison("v1.4.0", "main", git_repo=current_dir, html_table=True)
+
+    # Przykład eksportu listy zmian dla narzędzi zewnętrznych (format z rozszerzenia: .jsonl lub .csv):
+    # run_complete_comparison(folder_old, folder_new, export_file=current_dir / "lookml_changes.jsonl")
+
+    # Przykład raportu HTML dla bardzo dużych różnic (dane w plikach po 20 000 wierszy obok raportu):
+    # run_complete_comparison(folder_old, folder_new, html_paged=True, html_chunk_rows=20000)
+
+    # Przykład analizy wpływu: przy każdej zmianie lista pól, które (przechodnio) się do niej odwołują:
+    # run_complete_comparison(folder_old, folder_new, html_table=True, impact=True)
+
+    # Przykład macierzy: jedna wersja bazowa względem kilku środowisk, każdy plik parsowany raz:
+    # run_matrix_comparison(folder_old, {"dev": current_dir / "dev", "staging": current_dir / "staging", "prod": folder_new}, html_table=True)